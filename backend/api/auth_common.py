@@ -0,0 +1,151 @@
+"""
+Request validation and response shaping shared by the sync (Flask, WSGI)
+and async (Quart, ASGI) versions of the auth routes. Nothing in here does
+I/O; each module does its own Mongo calls with its own driver.
+"""
+import hmac
+
+from models.user import normalized_fields, DEFAULT_AVATAR_URL
+
+MAX_PROFILE_BATCH = 200
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 500
+
+BUSY_ERROR = {'error': 'Server is busy, please try again shortly'}
+RATE_LIMIT_ERROR = {'error': 'Too many requests, please try again later'}
+INVALIDATE_TOKEN_HEADER = 'X-Cache-Invalidate-Token'
+
+
+class RequestError(Exception):
+    """A request the route rejects with `status` and {'error': message}."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def registration_fields(data):
+    data = data or {}
+    email = data.get('email')
+    nickname = data.get('nickname')
+    password = data.get('password')
+    re_password = data.get('re_password')
+
+    if not email or not nickname or not password or not re_password:
+        raise RequestError('All fields are required')
+    if password != re_password:
+        raise RequestError('Passwords do not match')
+    return email, nickname, password
+
+
+def new_user_document(email, nickname, password_hash):
+    return {
+        'email': email,
+        'nickname': nickname,
+        'password_hash': password_hash,
+        **normalized_fields(email, nickname)
+    }
+
+
+def login_fields(data):
+    data = data or {}
+    return data.get('email'), data.get('password')
+
+
+def account_key(data):
+    """
+    The account a login/register attempt is for, as rate limiting keys it.
+    """
+    email = (data or {}).get('email') if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def token_identity(user):
+    return {'email': user['email'], 'nickname': user['nickname']}
+
+
+def login_payload(user, access_token):
+    return {
+        'message': 'Login successful!',
+        'access_token': access_token,
+        'email': user['email'],
+        'nickname': user['nickname'],
+        'avatarUrl': user.get('avatarUrl', DEFAULT_AVATAR_URL)
+    }
+
+
+def search_args(args):
+    limit = min(max(args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+    return args.get('q', ''), limit
+
+
+def inbox_args(args):
+    email = args.get('email')
+    if not email:
+        raise RequestError('Email is required')
+    return email, args.get('limit', 0, type=int)
+
+
+def mark_read_fields(data):
+    data = data or {}
+    email = data.get('email')
+    participant = data.get('participant')
+    if not email or not participant:
+        raise RequestError('email and participant are required')
+    return email, participant
+
+
+def message_page_args(args):
+    """
+    Returns (before, after, stream, limit) for /chat/messages; limit 0 means
+    "no limit": a stream, or a request with no paging params at all, which
+    still gets the whole history as one array as it did before paging.
+    """
+    if not any(args.get(k) for k in ('limit', 'before', 'after', 'stream')):
+        return None, None, False, 0
+
+    before = args.get('before')
+    after = args.get('after')
+    if before and after:
+        raise RequestError('Use either before or after, not both')
+
+    stream = args.get('stream') == '1'
+    limit = args.get('limit', 0 if stream else DEFAULT_MESSAGE_PAGE_SIZE, type=int)
+    if limit < 0:
+        raise RequestError('limit must be positive')
+
+    if stream:
+        if before:
+            raise RequestError('Streaming only supports after')
+        return before, after, stream, limit
+    return before, after, stream, min(limit or DEFAULT_MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE)
+
+
+def profile_email(args):
+    email = args.get('email')
+    if not email:
+        raise RequestError('Email is required')
+    return email
+
+
+def check_invalidate_token(expected, headers):
+    """
+    /auth/user/invalidate is for internal callers only (node, on avatar
+    upload): they must send CACHE_INVALIDATE_TOKEN in INVALIDATE_TOKEN_HEADER.
+    With no token configured the endpoint refuses everyone.
+    """
+    provided = headers.get(INVALIDATE_TOKEN_HEADER, '')
+    if not expected or not hmac.compare_digest(provided.encode(), expected.encode()):
+        raise RequestError('Forbidden', 403)
+
+
+def profile_batch_emails(data):
+    emails = (data or {}).get('emails')
+    if not isinstance(emails, list) or not all(isinstance(e, str) for e in emails):
+        raise RequestError('emails must be a list of strings')
+    if len(emails) > MAX_PROFILE_BATCH:
+        raise RequestError(f'At most {MAX_PROFILE_BATCH} emails per request')
+    return emails
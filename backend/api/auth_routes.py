@@ -1,39 +1,75 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from extensions.database import mongo
 from flask_jwt_extended import create_access_token
+from api.auth_common import (
+    RequestError, BUSY_ERROR, RATE_LIMIT_ERROR, account_key, registration_fields, new_user_document, login_fields, token_identity,
+    login_payload, search_args, inbox_args, mark_read_fields,
+    message_page_args, profile_email, profile_batch_emails, check_invalidate_token
+)
+from models.message import fetch_message_page, iter_messages, InvalidCursor
+from models.conversation import inbox_cursor, mark_read
+from models.user import search_users as find_users, user_search_index, get_profiles
+from extensions.cache import profile_cache
+from extensions.hashing import hasher, HasherBusy
+from extensions.rate_limit import rate_limiter, RateLimited
 
 auth = Blueprint('auth', __name__)
 
-@auth.route('/register', methods=['POST']) 
+
+def too_many_requests(error, retry_after):
+    response = jsonify(error)
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
+@auth.before_request
+def rate_limit():
+    """
+    Admission control per RATE_LIMITS (extensions/rate_limit.py).
+    """
+    if request.method == 'OPTIONS':
+        return
+    account = None
+    if rate_limiter.needs_account(request.endpoint):
+        account = account_key(request.get_json(silent=True))
+    rate_limiter.hit(request.endpoint, rate_limiter.client_ip(request), account)
+
+
+@auth.errorhandler(RateLimited)
+def rate_limited(e):
+    return too_many_requests(RATE_LIMIT_ERROR, e.retry_after)
+
+
+@auth.errorhandler(RequestError)
+def request_error(e):
+    return jsonify({'error': e.message}), e.status
+
+
+@auth.errorhandler(HasherBusy)
+def hasher_busy(e):
+    return too_many_requests(BUSY_ERROR, e.retry_after)
+
+
+@auth.route('/register', methods=['POST'])
 def register():
     try:
         db = mongo.get_db()
-        print(f"Debug: MongoDB database: {db}")
-
-        data = request.get_json()
-        email = data.get('email')
-        nickname = data.get('nickname')
-        password = data.get('password')
-        re_password = data.get('re_password')
-
-        if not email or not nickname or not password or not re_password:
-            return jsonify({'error': 'All fields are required'}), 400
-        if password != re_password:
-            return jsonify({'error': 'Passwords do not match'}), 400
+        email, nickname, password = registration_fields(request.get_json())
 
         existing_user = db.users.find_one({'email': email})
         if existing_user:
             return jsonify({'error': 'Email already registered'}), 409
 
-        db.users.insert_one({
-            'email': email,
-            'nickname': nickname,
-            'password_hash': generate_password_hash(password)
-        })
+        new_user = new_user_document(email, nickname, hasher.hash(password))
+        db.users.insert_one(new_user)
+        profile_cache.invalidate(email)
+        if current_app.config.get('USER_SEARCH_NGRAM'):
+            user_search_index.add(new_user)
         return jsonify({'message': 'User registered successfully'}), 201
+    except (RequestError, HasherBusy):
+        raise
     except Exception as e:
-        print(f"Error during registration: {e}")
+        current_app.logger.exception("Error during registration: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -41,127 +77,129 @@ def register():
 def login():
     try:
         db = mongo.get_db()
-
-        data = request.get_json()
-        email = data.get('email')
-        password = data.get('password')
+        email, password = login_fields(request.get_json())
 
         user = db.users.find_one({'email': email})
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        if not check_password_hash(user['password_hash'], password):
+        if not password or not hasher.verify(user['password_hash'], password):
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        access_token = create_access_token(
-            identity={'email': user['email'], 'nickname': user['nickname']}
-        )
-
-        # <<<<< KEY CHANGE: return user['avatarUrl'] if present >>>>>
-        avatar_url = user.get('avatarUrl', './avatar.png')  # or any default
-
+        # Transparently move the hash to the current PASSWORD_HASH_METHOD
+        if hasher.needs_rehash(user['password_hash']):
+            try:
+                db.users.update_one({'_id': user['_id']},
+                                    {'$set': {'password_hash': hasher.hash(password)}})
+            except HasherBusy:
+                pass  # upgrade on a later login
 
-        return jsonify({
-            'message': 'Login successful!',
-            'access_token': access_token,
-            'email': user['email'],
-            'nickname': user['nickname'],
-            'avatarUrl': avatar_url  # <<<<< ADDED
-        }), 200
+        access_token = create_access_token(identity=token_identity(user))
+        return jsonify(login_payload(user, access_token)), 200
+    except (RequestError, HasherBusy):
+        raise
     except Exception as e:
-        print(f"Error during login: {e}")
+        current_app.logger.exception("Error during login: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 @auth.route('/users', methods=['GET'])
 def search_users():
+    """
+    Autocomplete: users whose nickname or email starts with `q` (or contains
+    it, when USER_SEARCH_NGRAM is on), best matches first, at most `limit`.
+    """
     try:
         db = mongo.get_db()
-        query = request.args.get('q', '').strip()
-        users = list(db.users.find(
-            {"$or": [
-                {"nickname": {"$regex": query, "$options": "i"}},
-                {"email": {"$regex": query, "$options": "i"}}
-            ]},
-            {"_id": 0, "email": 1, "nickname": 1}
-        ))
+        query, limit = search_args(request.args)
+        ngram_index = user_search_index if current_app.config.get('USER_SEARCH_NGRAM') else None
+        users = find_users(db, query, limit, ngram_index=ngram_index)
         return jsonify(users), 200
     except Exception as e:
-        print(f"Error during user search: {e}")
+        current_app.logger.exception("Error during user search: %s", e)
         return jsonify({'error': 'Unable to fetch users'}), 500
 
 @auth.route('/conversations', methods=['GET'])
 def get_conversations():
     """
-    Returns the last message of each conversation for the logged-in user's email.
+    Returns the last message of each conversation for the logged-in user's email,
+    read from the precomputed inbox (see models/conversation.py) and streamed
+    straight off the cursor.
     """
     try:
         db = mongo.get_db()
-        email = request.args.get('email')
-
-        if not email:
-            return jsonify({'error': 'Email is required'}), 400
-
-        # <<<<< KEY CHANGE >>>>>
-        # Use 'sender' or 'recipient' instead of 'email' to match messages
-        conversations = db.messages.aggregate([
-            {
-                "$match": {
-                    "$or": [
-                        {"sender": email},
-                        {"recipient": email}
-                    ]
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        # if the sender is me, group by the recipient
-                        "$cond": [
-                            {"$eq": ["$sender", email]},
-                            "$recipient",
-                            "$sender"
-                        ]
-                    },
-                    "lastMessage": {"$last": "$message"},
-                    "timestamp": {"$last": "$timestamp"}
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "participant": "$_id",
-                    "lastMessage": 1,
-                    "timestamp": 1
-                }
-            },
-            {"$sort": {"timestamp": -1}}
-        ])
-
-        result = list(conversations)
-        print("Fetched conversations:", result)
-        return jsonify(result), 200
+        email, limit = inbox_args(request.args)
+        return current_app.json.array_response(inbox_cursor(db, email, limit=limit)), 200
+    except RequestError:
+        raise
     except Exception as e:
-        print(f"Error fetching conversations: {e}")
+        current_app.logger.exception("Error fetching conversations: %s", e)
         return jsonify({'error': 'Unable to fetch conversations'}), 500
 
 
+@auth.route('/conversations/read', methods=['POST'])
+def conversation_read():
+    """
+    Resets the unread counter of one conversation.
+    """
+    try:
+        db = mongo.get_db()
+        email, participant = mark_read_fields(request.get_json())
+        if not mark_read(db, email, participant):
+            return jsonify({'error': 'Conversation not found'}), 404
+        return jsonify({'message': 'Conversation marked as read'}), 200
+    except RequestError:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error marking conversation read: %s", e)
+        return jsonify({'error': 'Unable to update conversation'}), 500
+
+
 @auth.route('/chat/messages/<chat_id>', methods=['GET'])
 def get_chat_messages(chat_id):
     """
-    Returns all messages for a specific chatId in ascending order.
+    Returns the messages of a specific chatId in ascending order: all of
+    them without query params (a JSON array streamed off the cursor, so
+    only one batch is in memory), otherwise one page.
+
+    Query params:
+      limit  - page size (default 50, max 500)
+      before - cursor; page of messages older than it
+      after  - cursor; page of messages newer than it
+      stream - if "1", streams the history (from `after`, if given) as NDJSON
+               and `limit` becomes optional
+    Every message carries a `cursor` to pass back as `before`/`after`.
     """
     try:
         db = mongo.get_db()
-        messages = list(db.messages.find(
-            {"chatId": chat_id},
-            {"_id": 0, "sender": 1, "recipient": 1, "message": 1, "file": 1, "timestamp": 1}
-        ).sort("timestamp", 1))
+        before, after, stream, limit = message_page_args(request.args)
+
+        if stream:
+            messages = iter_messages(db, chat_id, after=after, limit=limit)
+            # Validate the cursor before the response headers go out
+            first = next(messages, None)
+            dumps = current_app.json.dumps_bytes
+
+            def generate():
+                if first is None:
+                    return
+                yield dumps(first) + b"\n"
+                for message in messages:
+                    yield dumps(message) + b"\n"
 
-        print(f"[DEBUG] Messages fetched for chatId '{chat_id}': {messages}")
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        if not limit:
+            return current_app.json.array_response(iter_messages(db, chat_id)), 200
+
+        messages = fetch_message_page(db, chat_id, limit, before=before, after=after)
         return jsonify(messages), 200
+    except RequestError:
+        raise
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"[ERROR] Error fetching messages for chatId '{chat_id}': {e}")
+        current_app.logger.exception("Error fetching messages for chatId '%s': %s", chat_id, e)
         return jsonify({'error': 'Unable to fetch messages'}), 500
 
 
@@ -169,11 +207,10 @@ def get_chat_messages(chat_id):
 def debug_mongo():
     try:
         from extensions.database import mongo
-        print(f"Debug: mongo = {mongo}")
-        print(f"Debug: mongo.db = {mongo.db}")
+        current_app.logger.debug("mongo.db = %s", mongo.get_db())
         return jsonify({"message": "MongoDB is initialized!"}), 200
     except Exception as e:
-        print(f"Debug Error: {e}")
+        current_app.logger.exception("Debug Error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -185,19 +222,50 @@ def get_user_info():
     """
     try:
         db = mongo.get_db()
-        email = request.args.get('email')
-        if not email:
-            return jsonify({'error': 'Email is required'}), 400
+        email = profile_email(request.args)
 
-        user = db.users.find_one({'email': email}, {'_id': 0, 'avatarUrl': 1, 'nickname': 1})
+        user = get_profiles(db, [email]).get(email)
         if not user:
             return jsonify({'error': 'User not found'}), 404
-
-        # user might look like {"avatarUrl": "...", "nickname": "..."}
-        # if avatarUrl is missing, fallback
-        if 'avatarUrl' not in user:
-            user['avatarUrl'] = './avatar.png'
         return jsonify(user), 200
+    except RequestError:
+        raise
     except Exception as e:
-        print(f"Error fetching user info: {e}")
+        current_app.logger.exception("Error fetching user info: %s", e)
         return jsonify({'error': 'Unable to fetch user info'}), 500
+
+
+@auth.route('/users/batch', methods=['POST'])
+def get_users_info():
+    """
+    Batch version of /user for rendering a whole conversation list:
+    {"emails": [...]} -> {email: {"avatarUrl": ..., "nickname": ...}}.
+    Unknown emails are left out.
+    """
+    try:
+        db = mongo.get_db()
+        emails = profile_batch_emails(request.get_json())
+        return jsonify(get_profiles(db, emails)), 200
+    except RequestError:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error fetching users info: %s", e)
+        return jsonify({'error': 'Unable to fetch user info'}), 500
+
+
+@auth.route('/user/invalidate', methods=['POST'])
+def invalidate_user_info():
+    """
+    Drops a user's cached profile; call it whenever avatarUrl or nickname change
+    (node's /file/upload-avatar does, when FLASK_BACKEND_URL and
+    CACHE_INVALIDATE_TOKEN are set). Only this process's cache is cleared:
+    others serve the old profile for at most PROFILE_CACHE_TTL seconds.
+    """
+    check_invalidate_token(current_app.config.get('CACHE_INVALIDATE_TOKEN'), request.headers)
+    profile_cache.invalidate(profile_email(request.get_json() or {}))
+    return jsonify({'message': 'Profile cache invalidated'}), 200
+
+
+@auth.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'profiles': profile_cache.stats()}), 200
@@ -0,0 +1,241 @@
+"""
+The auth blueprint for the async serving mode (SERVING_MODE = "asgi", see
+asgi.py): the same routes as api/auth_routes.py as Quart `async def` views on
+pymongo's AsyncMongoClient, so a request waiting on Mongo doesn't hold a
+thread. Validation and response shaping come from api/auth_common.py.
+"""
+import flask_jwt_extended
+from quart import Blueprint, request, jsonify, Response, current_app
+from extensions.async_database import async_mongo
+from api.auth_common import (
+    RequestError, BUSY_ERROR, RATE_LIMIT_ERROR, account_key, registration_fields, new_user_document, login_fields, token_identity,
+    login_payload, search_args, inbox_args, mark_read_fields,
+    message_page_args, profile_email, profile_batch_emails, check_invalidate_token
+)
+from models.message import fetch_message_page_async, iter_messages_async, InvalidCursor
+from models.conversation import inbox_cursor, mark_read_async
+from models.user import search_users_async, user_search_index, get_profiles_async
+from extensions.cache import profile_cache
+from extensions.hashing import hasher, HasherBusy
+from extensions.rate_limit import rate_limiter, RateLimited
+
+auth = Blueprint('auth', __name__)
+
+
+def create_access_token(identity):
+    """
+    flask_jwt_extended.create_access_token, which only runs under a Flask app
+    context: it is issued in the context of the Flask app asgi.py keeps for
+    this (sharing this app's config), so every JWT_* setting applies exactly
+    as in the sync app.
+    """
+    with current_app.extensions['jwt_flask_app'].app_context():
+        return flask_jwt_extended.create_access_token(identity)
+
+
+@auth.before_request
+async def rate_limit():
+    if request.method == 'OPTIONS':
+        return
+    account = None
+    if rate_limiter.needs_account(request.endpoint):
+        account = account_key(await request.get_json(silent=True))
+    await rate_limiter.hit_async(request.endpoint, rate_limiter.client_ip(request), account)
+
+
+@auth.errorhandler(RateLimited)
+async def rate_limited(e):
+    return jsonify(RATE_LIMIT_ERROR), 429, {'Retry-After': str(e.retry_after)}
+
+
+@auth.errorhandler(RequestError)
+async def request_error(e):
+    return jsonify({'error': e.message}), e.status
+
+
+@auth.errorhandler(HasherBusy)
+async def hasher_busy(e):
+    return jsonify(BUSY_ERROR), 429, {'Retry-After': str(e.retry_after)}
+
+
+@auth.route('/register', methods=['POST'])
+async def register():
+    try:
+        db = async_mongo.get_db()
+        email, nickname, password = registration_fields(await request.get_json())
+
+        existing_user = await db.users.find_one({'email': email})
+        if existing_user:
+            return jsonify({'error': 'Email already registered'}), 409
+
+        new_user = new_user_document(email, nickname, await hasher.hash_async(password))
+        await db.users.insert_one(new_user)
+        profile_cache.invalidate(email)
+        if current_app.config.get('USER_SEARCH_NGRAM'):
+            user_search_index.add(new_user)
+        return jsonify({'message': 'User registered successfully'}), 201
+    except (RequestError, HasherBusy):
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error during registration: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@auth.route('/login', methods=['POST'])
+async def login():
+    try:
+        db = async_mongo.get_db()
+        email, password = login_fields(await request.get_json())
+
+        user = await db.users.find_one({'email': email})
+        if not user:
+            return jsonify({'error': 'Invalid credentials'}), 401
+
+        if not password or not await hasher.verify_async(user['password_hash'], password):
+            return jsonify({'error': 'Invalid credentials'}), 401
+
+        if hasher.needs_rehash(user['password_hash']):
+            try:
+                await db.users.update_one({'_id': user['_id']},
+                                          {'$set': {'password_hash': await hasher.hash_async(password)}})
+            except HasherBusy:
+                pass  # upgrade on a later login
+
+        access_token = create_access_token(token_identity(user))
+        return jsonify(login_payload(user, access_token)), 200
+    except (RequestError, HasherBusy):
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error during login: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@auth.route('/users', methods=['GET'])
+async def search_users():
+    try:
+        db = async_mongo.get_db()
+        query, limit = search_args(request.args)
+        ngram_index = user_search_index if current_app.config.get('USER_SEARCH_NGRAM') else None
+        users = await search_users_async(db, query, limit, ngram_index=ngram_index)
+        return jsonify(users), 200
+    except Exception as e:
+        current_app.logger.exception("Error during user search: %s", e)
+        return jsonify({'error': 'Unable to fetch users'}), 500
+
+
+@auth.route('/conversations', methods=['GET'])
+async def get_conversations():
+    try:
+        db = async_mongo.get_db()
+        email, limit = inbox_args(request.args)
+        return await current_app.json.array_response_async(inbox_cursor(db, email, limit=limit)), 200
+    except RequestError:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error fetching conversations: %s", e)
+        return jsonify({'error': 'Unable to fetch conversations'}), 500
+
+
+@auth.route('/conversations/read', methods=['POST'])
+async def conversation_read():
+    try:
+        db = async_mongo.get_db()
+        email, participant = mark_read_fields(await request.get_json())
+        if not await mark_read_async(db, email, participant):
+            return jsonify({'error': 'Conversation not found'}), 404
+        return jsonify({'message': 'Conversation marked as read'}), 200
+    except RequestError:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error marking conversation read: %s", e)
+        return jsonify({'error': 'Unable to update conversation'}), 500
+
+
+@auth.route('/chat/messages/<chat_id>', methods=['GET'])
+async def get_chat_messages(chat_id):
+    """
+    See api/auth_routes.get_chat_messages for the query params.
+    """
+    try:
+        db = async_mongo.get_db()
+        before, after, stream, limit = message_page_args(request.args)
+
+        if stream:
+            messages = iter_messages_async(db, chat_id, after=after, limit=limit)
+            # Validate the cursor before the response headers go out
+            first = await anext(messages, None)
+            dumps = current_app.json.dumps_bytes
+
+            async def generate():
+                if first is None:
+                    return
+                yield dumps(first) + b"\n"
+                async for message in messages:
+                    yield dumps(message) + b"\n"
+
+            return Response(generate(), mimetype='application/x-ndjson')
+
+        if not limit:
+            return await current_app.json.array_response_async(iter_messages_async(db, chat_id)), 200
+
+        messages = await fetch_message_page_async(db, chat_id, limit, before=before, after=after)
+        return jsonify(messages), 200
+    except RequestError:
+        raise
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception("Error fetching messages for chatId '%s': %s", chat_id, e)
+        return jsonify({'error': 'Unable to fetch messages'}), 500
+
+
+@auth.route('/debug-mongo', methods=['GET'])
+async def debug_mongo():
+    try:
+        current_app.logger.debug("mongo.db = %s", async_mongo.get_db())
+        return jsonify({"message": "MongoDB is initialized!"}), 200
+    except Exception as e:
+        current_app.logger.exception("Debug Error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@auth.route('/user', methods=['GET'])
+async def get_user_info():
+    try:
+        db = async_mongo.get_db()
+        email = profile_email(request.args)
+
+        user = (await get_profiles_async(db, [email])).get(email)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify(user), 200
+    except RequestError:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error fetching user info: %s", e)
+        return jsonify({'error': 'Unable to fetch user info'}), 500
+
+
+@auth.route('/users/batch', methods=['POST'])
+async def get_users_info():
+    try:
+        db = async_mongo.get_db()
+        emails = profile_batch_emails(await request.get_json())
+        return jsonify(await get_profiles_async(db, emails)), 200
+    except RequestError:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error fetching users info: %s", e)
+        return jsonify({'error': 'Unable to fetch user info'}), 500
+
+
+@auth.route('/user/invalidate', methods=['POST'])
+async def invalidate_user_info():
+    check_invalidate_token(current_app.config.get('CACHE_INVALIDATE_TOKEN'), request.headers)
+    profile_cache.invalidate(profile_email(await request.get_json() or {}))
+    return jsonify({'message': 'Profile cache invalidated'}), 200
+
+
+@auth.route('/cache/stats', methods=['GET'])
+async def cache_stats():
+    return jsonify({'profiles': profile_cache.stats()}), 200
@@ -1,54 +1,98 @@
+import os
 from flask import Flask, jsonify
-from flask_login import LoginManager
 from dotenv import load_dotenv
-import os
-from extensions.database import mongo
-from flask_jwt_extended import JWTManager
-from flask_cors import CORS  # Import CORS
 
-# Load environment variables
-load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
+def create_app(config_name=None):
+    """
+    Builds the Flask app with the config.py class named by `config_name`
+    (or FLASK_CONFIG): "default", "development", "testing" or "production".
+
+    Extensions and blueprints are imported here rather than at module level,
+    and nothing touches MongoDB until a route needs it: the client (and its
+    indexes) are created on first use, so `/` never waits for the database.
+    """
+    # Load environment variables before config.py reads them
+    load_dotenv()
+    from config import config_by_name
+
+    # Initialize Flask app
+    app = Flask(__name__)
+    app.config.from_object(config_by_name[config_name or os.getenv('FLASK_CONFIG', 'default')])
 
-# Load configurations
-app.config['MONGO_URI'] = os.getenv('MONGO_URI')
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'fallback_secret_key')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
+    from extensions.json_provider import FastJSONProvider
+    from extensions.compression import compression
+    from extensions.database import mongo
+    from extensions.cache import profile_cache
+    from extensions.hashing import hasher
+    from extensions.instrumentation import instrumentation
+    from extensions.rate_limit import rate_limiter
+    from flask_login import LoginManager
+    from flask_jwt_extended import JWTManager
+    from flask_cors import CORS
 
-# Allow CORS
-CORS(app, supports_credentials=True, resources={r"/*": {
-    "origins": [
-        "http://127.0.0.1:5173",
-        "http://localhost:5173"
-    ],
-    "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    "allow_headers": ["Content-Type", "Authorization"],
-    "supports_credentials": True
-}})
+    # orjson-backed JSON (ObjectId/datetime aware) for every jsonify
+    app.json = FastJSONProvider(app)
 
+    # Allow CORS
+    CORS(app, supports_credentials=True, resources={r"/*": {
+        "origins": app.config['CORS_ORIGINS'],
+        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization"],
+        "supports_credentials": True
+    }})
 
-# Initialize extensions
-login_manager = LoginManager()
-jwt = JWTManager()
+    # Initialize extensions
+    mongo.init_app(app)
+    profile_cache.init_app(app, 'PROFILE_CACHE')
+    hasher.init_app(app)
+    rate_limiter.init_app(app, get_db=mongo.get_db)
+    instrumentation.init_app(app, mongo_metrics=mongo.metrics)
+    compression.init_app(app)
+    LoginManager().init_app(app)
+    JWTManager().init_app(app)
 
-mongo.init_app(app)
-login_manager.init_app(app)
-jwt.init_app(app)
+    # Register blueprints
+    from api.auth_routes import auth
+    app.register_blueprint(auth, url_prefix='/auth')
 
-# Debugging MongoDB initialization
-print(f"Debug: Connected to MongoDB database: {mongo.get_db()}")
+    # CLI commands (flask inbox backfill, flask users import, flask messages export, ...)
+    from commands import inbox_cli, users_cli, messages_cli
+    app.cli.add_command(inbox_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(messages_cli)
 
-# Register blueprints
-from api.auth_routes import auth
-app.register_blueprint(auth, url_prefix='/auth')
+    # ✅ Add a basic route to confirm deployment; never touches MongoDB
+    @app.route('/')
+    def home():
+        return jsonify({"message": "Welcome to the backend of Flask!"})
+
+    # Readiness probe: connects (lazily) and pings MongoDB
+    @app.route('/ready')
+    def ready():
+        if not mongo.ping():
+            return jsonify({"status": "unavailable"}), 503
+        return jsonify({"status": "ok"})
+
+    # Per-route latency, connection pool, per-command latency, cache and rate limit counters
+    @app.route('/metrics')
+    def metrics():
+        return jsonify({
+            "routes": instrumentation.snapshot(),
+            "mongo": mongo.stats(),
+            "profileCache": profile_cache.stats(),
+            "rateLimits": rate_limiter.stats()
+        })
+
+    return app
 
-# ✅ Add a basic route to confirm deployment
-@app.route('/')
-def home():
-    return jsonify({"message": "Welcome to the backend of Flask!"})
 
 # ✅ This ensures Vercel can recognize `app`
+app = create_app()
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    if app.config['SERVING_MODE'] == 'asgi':
+        import uvicorn
+        uvicorn.run("asgi:app", port=5000, reload=True)
+    else:
+        app.run(debug=True)
@@ -0,0 +1,83 @@
+"""
+Async serving mode: the auth blueprint as Quart `async def` views on an
+async Mongo client, for an ASGI server:
+
+    uvicorn asgi:app --workers 4
+
+or `SERVING_MODE=asgi python app.py`. The WSGI app in app.py is unchanged.
+"""
+import os
+from dotenv import load_dotenv
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from quart import Quart, jsonify
+from quart_cors import cors
+from extensions.async_database import async_mongo
+from extensions.cache import profile_cache
+from extensions.hashing import hasher
+from extensions.json_provider import FastJSONProvider
+from extensions.rate_limit import rate_limiter
+
+
+def create_asgi_app(config_name=None):
+    load_dotenv()
+    from config import config_by_name
+
+    app = Quart(__name__)
+    app.config.from_object(config_by_name[config_name or os.getenv('FLASK_CONFIG', 'default')])
+    app.json = FastJSONProvider(app)
+
+    app = cors(app, allow_origin=app.config['CORS_ORIGINS'], allow_credentials=True,
+               allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+               allow_headers=["Content-Type", "Authorization"])
+
+    async_mongo.init_app(app)
+    profile_cache.init_app(app, 'PROFILE_CACHE')
+    hasher.init_app(app)
+    rate_limiter.init_app(app, get_db=async_mongo.get_db)
+
+    # flask_jwt_extended needs a Flask app context to issue tokens; this bare
+    # Flask app shares our config, see auth_routes_async.create_access_token
+    jwt_flask_app = Flask(__name__)
+    jwt_flask_app.config = app.config
+    JWTManager().init_app(jwt_flask_app)
+    app.extensions['jwt_flask_app'] = jwt_flask_app
+
+    from api.auth_routes_async import auth
+    app.register_blueprint(auth, url_prefix='/auth')
+
+    @app.before_serving
+    async def startup():
+        try:
+            await async_mongo.ensure_indexes_async()
+        except Exception as e:
+            # Serve anyway (like the WSGI app); /ready reports the outage
+            app.logger.error("Could not ensure MongoDB indexes: %s", e)
+
+    @app.after_serving
+    async def shutdown():
+        await async_mongo.close()
+        hasher.shutdown()
+
+    @app.route('/')
+    async def home():
+        return jsonify({"message": "Welcome to the backend of Flask!"})
+
+    @app.route('/ready')
+    async def ready():
+        if not await async_mongo.ping_async():
+            return jsonify({"status": "unavailable"}), 503
+        return jsonify({"status": "ok"})
+
+    @app.route('/metrics')
+    async def metrics():
+        return jsonify({
+            "mongo": async_mongo.stats(),
+            "profileCache": profile_cache.stats(),
+            "rateLimits": rate_limiter.stats()
+        })
+
+    return app
+
+
+app = create_asgi_app()
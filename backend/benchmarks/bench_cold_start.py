@@ -0,0 +1,137 @@
+"""
+Cold start of the WSGI app: what a serverless (Vercel) instance pays before
+answering its first request.
+
+Each run is a fresh interpreter that imports app.py and serves `/` through
+the test client; the script reports median and p90 of the import time, the
+first-request time and their sum, and, from one `python -X importtime` run,
+the heaviest imports. MONGO_URI points at a port nobody listens on, so the
+run also fails if `/` (or the import) connects to MongoDB or imports pymongo.
+
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --save cold_start.json
+    python benchmarks/bench_cold_start.py --baseline cold_start.json --max-regression 0.2
+
+With --baseline the exit status is 1 if the median total got more than
+--max-regression slower, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/')
+served = time.perf_counter()
+from extensions.database import mongo
+print(json.dumps({
+    'importMs': (imported - start) * 1000,
+    'firstRequestMs': (served - imported) * 1000,
+    'status': response.status_code,
+    'pymongoImported': 'pymongo' in sys.modules,
+    'mongoConnected': mongo.client is not None
+}))
+"""
+
+
+def probe_env(uri):
+    return dict(os.environ, MONGO_URI=uri, JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY', 'cold-start-bench'),
+                PYTHONDONTWRITEBYTECODE='0')
+
+
+def run_probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_breakdown(env, top):
+    """
+    (cumulative ms, module) of the heaviest modules app.py pulls in directly.
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    total = None
+    direct = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if name.strip() == 'app' and depth == 0:
+            total = int(cumulative) / 1000
+        elif depth == 1:
+            direct.append((int(cumulative) / 1000, name.strip()))
+    return total, sorted(direct, reverse=True)[:top]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {'median': statistics.median(values), 'p90': values[min(len(values) - 1, int(len(values) * 0.9))]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports to list')
+    parser.add_argument('--uri', default='mongodb://127.0.0.1:1/cold_start',
+                        help='MONGO_URI for the probe; should not be reachable')
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    env = probe_env(args.uri)
+    run_probe(env)  # warm the bytecode cache, as a deployed bundle would be
+    runs = [run_probe(env) for _ in range(args.runs)]
+    results = {
+        'importMs': summarize([r['importMs'] for r in runs]),
+        'firstRequestMs': summarize([r['firstRequestMs'] for r in runs]),
+        'totalMs': summarize([r['importMs'] + r['firstRequestMs'] for r in runs])
+    }
+
+    print(f"{'':<16}{'median ms':>12}{'p90 ms':>10}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['median']:>12.1f}{stats['p90']:>10.1f}")
+
+    total, heaviest = import_breakdown(env, args.top)
+    if total is not None:
+        print(f"\n-X importtime: app {total:.1f}ms cumulative; heaviest direct imports:")
+    for ms, module in heaviest:
+        print(f"  {ms:>8.1f}ms  {module}")
+
+    failures = []
+    last = runs[-1]
+    if last['status'] != 200:
+        failures.append(f"/ answered {last['status']}")
+    if last['mongoConnected']:
+        failures.append("importing the app or serving / created a MongoDB client")
+    if last['pymongoImported']:
+        failures.append("importing the app or serving / imported pymongo")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            before = json.load(f)['totalMs']['median']
+        after = results['totalMs']['median']
+        print(f"\nmedian total {before:.1f}ms -> {after:.1f}ms")
+        if after > before * (1 + args.max_regression):
+            failures.append(f"median total regressed more than {args.max_regression:.0%}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
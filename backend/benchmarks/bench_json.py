@@ -0,0 +1,147 @@
+"""
+JSON encoding cost of the chat history and inbox payloads.
+
+Encodes 1k/10k/100k message and inbox documents (as pymongo returns them:
+ObjectId, naive UTC datetimes) with Flask's stock provider, with
+FastJSONProvider, and with FastJSONProvider.array_response straight off an
+iterator, plus the gzip/br cost of the result. With --routes it also times
+get_chat_messages (stream=1) and get_conversations end to end through the
+Flask test client.
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --size 100000 --routes --uri mongodb://localhost:27017/chat_bench
+    python benchmarks/bench_json.py --routes --mock
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+START = datetime(2025, 1, 1)
+
+
+def message_docs(n, chat_id='bench_chat'):
+    return [{'_id': ObjectId(), 'chatId': chat_id, 'sender': 'user0@bench.local', 'recipient': 'user1@bench.local',
+             'message': f'message {i} with a little text in it', 'file': None,
+             'timestamp': START + timedelta(seconds=i)} for i in range(n)]
+
+
+def inbox_docs(n, email='user0@bench.local'):
+    return [{'user': email, 'participant': f'user{i}@bench.local', 'chatId': f'bench_{i}',
+             'lastMessage': f'last message {i}', 'timestamp': START + timedelta(seconds=i),
+             'unreadCount': i % 7} for i in range(n)]
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def encoders(app):
+    """
+    name -> fn(docs) returning the encoded body. The documents are copied
+    first so every run starts from fresh cursor-shaped dicts.
+    """
+    from flask.json.provider import DefaultJSONProvider
+    from models.message import serialize_message
+    from extensions.json_provider import FastJSONProvider
+
+    stock = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    def shape(docs):
+        # Messages get their cursor; the stock provider can't encode ObjectId
+        return (serialize_message(dict(d)) if '_id' in d else dict(d) for d in docs)
+
+    return {
+        'stock jsonify': lambda docs: stock.dumps(list(shape(docs)), separators=(',', ':')).encode(),
+        'fast provider': lambda docs: fast.dumps_bytes(list(shape(docs))),
+        'fast array_response': lambda docs: fast.array_response(shape(docs)).get_data(),
+    }
+
+
+def compressors(level):
+    result = {'gzip': lambda body: gzip.compress(body, compresslevel=level, mtime=0)}
+    try:
+        import brotli
+        result['br'] = lambda body: brotli.compress(body, quality=4)
+    except ImportError:
+        pass
+    return result
+
+
+def bench_encoding(app, sizes, repeat, level):
+    print(f"{'payload':<10}{'docs':>8}  {'encoder':<22}{'ms':>9}{'KiB':>9}")
+    for name, make in (('messages', message_docs), ('inbox', inbox_docs)):
+        for size in sizes:
+            docs = make(size)
+            body = b''
+            for encoder, fn in encoders(app).items():
+                ms, body = best_of(lambda: fn(docs), repeat)
+                print(f"{name:<10}{size:>8}  {encoder:<22}{ms:>9.2f}{len(body) / 1024:>9.1f}")
+            for encoding, fn in compressors(level).items():
+                ms, compressed = best_of(lambda: fn(body), repeat)
+                print(f"{name:<10}{size:>8}  {'+ ' + encoding:<22}{ms:>9.2f}{len(compressed) / 1024:>9.1f}")
+
+
+def bench_routes(app, db, sizes, repeat):
+    client = app.test_client()
+    print(f"\n{'route':<26}{'docs':>8}  {'encoding':<10}{'ms':>9}{'KiB':>9}")
+    for size in sizes:
+        db.messages.delete_many({'chatId': 'bench_chat'})
+        db.conversations.delete_many({'user': 'user0@bench.local'})
+        for start in range(0, size, 10000):
+            db.messages.insert_many(message_docs(min(10000, size - start)), ordered=False)
+            db.conversations.insert_many(inbox_docs(min(10000, size - start)), ordered=False)
+        routes = [('get_chat_messages', '/auth/chat/messages/bench_chat?stream=1'),
+                  ('get_conversations', '/auth/conversations?email=user0@bench.local')]
+        for route, url in routes:
+            for encoding in ('identity', 'gzip'):
+                def fetch():
+                    response = client.get(url, headers={'Accept-Encoding': encoding})
+                    body = response.get_data()
+                    response.close()
+                    return body
+                ms, body = best_of(fetch, repeat)
+                print(f"{route:<26}{size:>8}  {encoding:<10}{ms:>9.2f}{len(body) / 1024:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, action='append', help='documents per payload')
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs')
+    parser.add_argument('--routes', action='store_true', help='also time the routes end to end')
+    parser.add_argument('--uri', default=os.getenv('MONGO_BENCH_URI', 'mongodb://localhost:27017/chat_bench'),
+                        help='database for --routes; bench_chat and user0 are replaced')
+    parser.add_argument('--mock', action='store_true', help='use mongomock instead of a mongod')
+    args = parser.parse_args()
+
+    os.environ['MONGO_URI'] = args.uri
+    os.environ['INSTRUMENTATION_ENABLED'] = '0'
+
+    from app import app
+    from extensions.json_provider import orjson
+    sizes = args.size or [1000, 10000, 100000]
+    print(f"orjson: {'yes' if orjson is not None else 'no (stdlib json)'}")
+    bench_encoding(app, sizes, args.repeat, app.config['COMPRESS_LEVEL'])
+
+    if args.routes:
+        from extensions.database import mongo
+        if args.mock:
+            import mongomock
+            mongo.client_factory = lambda uri, **options: mongomock.MongoClient(uri)
+        bench_routes(app, mongo.get_db(), sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Login throughput of the password hasher at different cost settings.
+
+Each "login" is one PasswordHasher.verify() call, driven by enough client
+threads to keep the pool busy, exactly like concurrent /auth/login requests.
+
+    python benchmarks/bench_password_hashing.py
+    python benchmarks/bench_password_hashing.py --workers 4 --logins 200 \
+        --method scrypt:16384:8:1 --method pbkdf2:sha256:600000
+    python benchmarks/bench_password_hashing.py --pool process
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from extensions.hashing import PasswordHasher, HasherBusy
+
+DEFAULT_METHODS = [
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+]
+
+
+def bench(method, pool, workers, queue_size, logins, clients):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_POOL=pool, PASSWORD_HASH_WORKERS=workers,
+                      PASSWORD_HASH_QUEUE_SIZE=queue_size)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    password_hash = hasher.hash('correct horse battery staple')
+
+    def login(_):
+        try:
+            return hasher.verify(password_hash, 'correct horse battery staple')
+        except HasherBusy:
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+
+    rejected = results.count(None)
+    return (logins - rejected) / elapsed, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--method', action='append', help='werkzeug method spec (repeatable)')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-size', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent login callers')
+    args = parser.parse_args()
+
+    print(f"pool={args.pool} workers={args.workers} queue={args.queue_size} clients={args.clients} logins={args.logins}")
+    print(f"{'method':<28}{'logins/sec':>12}{'rejected':>10}")
+    for method in args.method or DEFAULT_METHODS:
+        rate, rejected = bench(method, args.pool, args.workers, args.queue_size, args.logins, args.clients)
+        print(f"{method:<28}{rate:>12.1f}{rejected:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Load-test benchmark for every route of the auth blueprint.
+
+Seeds a local MongoDB with N users and M messages, drives each route through
+the Flask test client (in-process, so the numbers measure the app and Mongo
+rather than an HTTP server) and reports p50/p99 latency and throughput.
+
+    python benchmarks/bench_routes.py --users 1000 --messages 100000
+    python benchmarks/bench_routes.py --save baseline.json
+    python benchmarks/bench_routes.py --baseline baseline.json --max-regression 0.2
+
+With --baseline the exit status is 1 if any route's p99 got more than
+--max-regression slower (or its throughput that much lower), so it can gate CI.
+--mock runs against mongomock when no mongod is available; those numbers
+are only useful relative to each other.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'bench-password'
+
+
+def chat_id_for(a, b):
+    return '_'.join(sorted((a, b)))
+
+
+def seed(db, hasher, users, messages, batch_size=5000):
+    from models.conversation import rebuild_inbox
+    from models.user import normalized_fields
+
+    for name in ('users', 'messages', 'conversations'):
+        db[name].delete_many({})
+
+    password_hash = hasher.hash(PASSWORD)
+    emails = [f'user{i}@bench.local' for i in range(users)]
+    batch = []
+    for i, email in enumerate(emails):
+        batch.append({'email': email, 'nickname': f'bench{i}', 'password_hash': password_hash,
+                      **normalized_fields(email, f'bench{i}')})
+        if len(batch) >= batch_size:
+            db.users.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.users.insert_many(batch, ordered=False)
+
+    rng = random.Random(42)
+    # Each user talks to a handful of others, so chats get realistic depth
+    partners = {email: rng.sample(emails, min(5, users)) for email in emails}
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for i in range(messages):
+        sender = rng.choice(emails)
+        recipient = rng.choice(partners[sender])
+        batch.append({'chatId': chat_id_for(sender, recipient), 'sender': sender, 'recipient': recipient,
+                      'message': f'message {i}', 'file': None, 'timestamp': start + timedelta(seconds=i)})
+        if len(batch) >= batch_size:
+            db.messages.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.messages.insert_many(batch, ordered=False)
+
+    rebuild_inbox(db)
+    return emails, partners
+
+
+def scenarios(emails, partners):
+    """
+    One request factory per auth route: rng -> (method, url, json body).
+    """
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def unique():
+        with lock:
+            return next(counter)
+
+    def pair(rng):
+        a = rng.choice(emails)
+        return a, rng.choice(partners[a])
+
+    return {
+        'auth.register': lambda rng: ('POST', '/auth/register', {
+            'email': f'new{unique()}@bench.local', 'nickname': 'new', 'password': PASSWORD, 're_password': PASSWORD}),
+        'auth.login': lambda rng: ('POST', '/auth/login', {'email': rng.choice(emails), 'password': PASSWORD}),
+        'auth.search_users': lambda rng: ('GET', f'/auth/users?q=bench{rng.randrange(100)}', None),
+        'auth.get_conversations': lambda rng: ('GET', f'/auth/conversations?email={rng.choice(emails)}', None),
+        'auth.conversation_read': lambda rng: ('POST', '/auth/conversations/read', dict(
+            zip(('email', 'participant'), pair(rng)))),
+        'auth.get_chat_messages': lambda rng: ('GET', f'/auth/chat/messages/{chat_id_for(*pair(rng))}', None),
+        'auth.debug_mongo': lambda rng: ('GET', '/auth/debug-mongo', None),
+        'auth.get_user_info': lambda rng: ('GET', f'/auth/user?email={rng.choice(emails)}', None),
+        'auth.get_users_info': lambda rng: ('POST', '/auth/users/batch', {'emails': rng.sample(emails, min(20, len(emails)))}),
+        'auth.invalidate_user_info': lambda rng: ('POST', '/auth/user/invalidate', {'email': rng.choice(emails)}),
+        'auth.cache_stats': lambda rng: ('GET', '/auth/cache/stats', None),
+    }
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_route(app, make_request, requests, concurrency):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(n, seed_value):
+        rng = random.Random(seed_value)
+        client = app.test_client()
+        # what node sends to /auth/user/invalidate; other routes ignore it
+        headers = {'X-Cache-Invalidate-Token': app.config['CACHE_INVALIDATE_TOKEN']}
+        local = []
+        local_statuses = {}
+        for _ in range(n):
+            method, url, body = make_request(rng)
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            response.get_data()
+            response.close()
+            local.append((time.perf_counter() - start) * 1000)
+            local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(n, i)) for i, n in enumerate(per_thread)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'p50Ms': percentile(latencies, 50),
+        'p99Ms': percentile(latencies, 99),
+        'throughput': requests / elapsed,
+        'statuses': {str(k): v for k, v in sorted(statuses.items())}
+    }
+
+
+def compare(results, baseline, max_regression):
+    failures = []
+    for route, result in results.items():
+        before = baseline.get(route)
+        if not before:
+            continue
+        if result['p99Ms'] > before['p99Ms'] * (1 + max_regression):
+            failures.append(f"{route}: p99 {before['p99Ms']:.2f}ms -> {result['p99Ms']:.2f}ms")
+        if result['throughput'] < before['throughput'] * (1 - max_regression):
+            failures.append(f"{route}: throughput {before['throughput']:.1f}/s -> {result['throughput']:.1f}/s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--uri', default=os.getenv('MONGO_BENCH_URI', 'mongodb://localhost:27017/chat_bench'),
+                        help='database to seed; it is wiped first')
+    parser.add_argument('--mock', action='store_true', help='use mongomock instead of a mongod')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--route', action='append', help='only these endpoints (e.g. auth.login)')
+    parser.add_argument('--hash-method', help='override PASSWORD_HASH_METHOD for register/login')
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ['MONGO_URI'] = args.uri
+    os.environ['INSTRUMENTATION_ENABLED'] = '0'
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+    os.environ.setdefault('CACHE_INVALIDATE_TOKEN', 'bench')
+    if args.hash_method:
+        os.environ['PASSWORD_HASH_METHOD'] = args.hash_method
+
+    from app import app
+    from extensions.database import mongo
+    from extensions.hashing import hasher
+    if args.mock:
+        import mongomock
+        mongo.client_factory = lambda uri, **options: mongomock.MongoClient(uri)
+
+    print(f"Seeding {args.users} users / {args.messages} messages into {args.uri} ...")
+    start = time.perf_counter()
+    emails, partners = seed(mongo.get_db(), hasher, args.users, args.messages)
+    print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+    routes = scenarios(emails, partners)
+    endpoints = sorted(rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.startswith('auth.'))
+    missing = [e for e in endpoints if e not in routes]
+    if missing:
+        print(f"WARNING: no scenario for {', '.join(missing)}")
+
+    results = {}
+    print(f"{'route':<30}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}  statuses")
+    for endpoint in endpoints:
+        if endpoint not in routes or (args.route and endpoint not in args.route):
+            continue
+        result = run_route(app, routes[endpoint], args.requests, args.concurrency)
+        results[endpoint] = result
+        print(f"{endpoint:<30}{result['p50Ms']:>10.2f}{result['p99Ms']:>10.2f}"
+              f"{result['throughput']:>10.1f}  {result['statuses']}")
+    hasher.shutdown()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Concurrent-connection throughput of the two serving modes.
+
+Seeds MongoDB (as bench_routes.py does), starts the WSGI app (gunicorn with
+--workers/--threads when installed, else werkzeug's threaded server) and the
+ASGI app (uvicorn with --workers), and drives the same I/O-bound auth routes
+at increasing numbers of concurrent keep-alive connections.
+
+    python benchmarks/bench_serving_modes.py --uri mongodb://localhost:27017/chat_bench
+    python benchmarks/bench_serving_modes.py --concurrency 1 --concurrency 64 --concurrency 512
+    python benchmarks/bench_serving_modes.py --mock --users 200 --messages 5000
+
+Only 2xx responses count towards req/s and latency; other statuses and
+client errors (refused or dropped connections) are reported per level, and
+the exit status is 1 if there were any.
+
+--mock serves each mode from one process on a seeded in-memory mongomock
+database (mongomock-motor for ASGI) when no mongod is available. mongomock
+is CPU-bound Python with no network wait, which is exactly what the async
+mode overlaps, so those numbers check the harness and the per-request
+overhead of each stack, not the I/O concurrency gain. mongomock is not
+thread-safe either, so the threaded WSGI server sees the odd 500 there.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import seed, chat_id_for
+
+
+def wsgi_command(port, workers, threads):
+    if shutil.which('gunicorn'):
+        return ['gunicorn', '--workers', str(workers), '--threads', str(threads),
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    return [sys.executable, '-c',
+            f"import logging; logging.getLogger('werkzeug').setLevel(logging.WARNING); "
+            f"from werkzeug.serving import run_simple; from app import app; "
+            f"run_simple('127.0.0.1', {port}, app, threaded=True)"]
+
+
+def asgi_command(port, workers):
+    return [sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'warning', 'asgi:app']
+
+
+MOCK_SERVER = """
+import logging
+import sys
+sys.path.insert(0, 'benchmarks')
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+import mongomock
+from bench_routes import seed
+from extensions.hashing import hasher
+mode, port, uri, users, messages = {args!r}
+client = mongomock.MongoClient(uri)
+if mode == 'wsgi':
+    from werkzeug.serving import run_simple
+    from app import app
+    from extensions.database import mongo
+    mongo.client_factory = lambda uri, **options: client
+    seed(mongo.get_db(), hasher, users, messages)
+    run_simple('127.0.0.1', port, app, threaded=True)
+else:
+    import uvicorn
+    from mongomock_motor import AsyncMongoMockClient
+    from asgi import app
+    from extensions.async_database import async_mongo
+    seed(client.get_default_database(), hasher, users, messages)
+    async_mongo.client_factory = lambda uri, **options: AsyncMongoMockClient(mock_mongo_client=client)
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+"""
+
+
+def mock_command(mode, port, uri, users, messages):
+    return [sys.executable, '-c', MOCK_SERVER.format(args=(mode, port, uri, users, messages))]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def fetch(reader, writer, path):
+    """
+    One keep-alive GET; returns (status, keep_alive), keep_alive False if the
+    server closes the connection.
+    """
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed before the response')
+    status = int(status_line.split()[1])
+    length = 0
+    chunked = False
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('connection closed mid-response')
+        if line in (b'\r\n', b'\n'):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(port, paths, deadline, latencies, failures, rng):
+    """
+    Keeps one connection busy until `deadline`. 2xx latencies go to
+    `latencies`; other statuses and connection errors are counted in
+    `failures` (the connection is then reopened).
+    """
+    writer = None
+    try:
+        while time.monotonic() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                start = time.perf_counter()
+                status, keep_alive = await fetch(reader, writer, rng.choice(paths))
+            except (OSError, asyncio.IncompleteReadError) as e:
+                failures[type(e).__name__] += 1
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                await asyncio.sleep(0.01)
+                continue
+            if 200 <= status < 300:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                failures[str(status)] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def load(port, paths, concurrency, duration):
+    """
+    Returns (2xx req/s, p50 ms, p99 ms, Counter of failures).
+    """
+    latencies = []
+    failures = Counter()
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client(port, paths, deadline, latencies, failures, random.Random(i))
+                           for i in range(concurrency)))
+    latencies.sort()
+    if not latencies:
+        return 0.0, 0.0, 0.0, failures
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / duration, p50, p99, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--uri', default=os.getenv('MONGO_BENCH_URI', 'mongodb://localhost:27017/chat_bench'))
+    parser.add_argument('--mock', action='store_true', help='serve from a seeded mongomock instead of a mongod')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per WSGI worker')
+    parser.add_argument('--concurrency', type=int, action='append')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per measurement')
+    args = parser.parse_args()
+
+    env = dict(os.environ, MONGO_URI=args.uri, INSTRUMENTATION_ENABLED='0', RATE_LIMIT_ENABLED='0')
+    os.environ.update(env)
+
+    import app  # noqa: F401 - configures the extensions
+    from extensions.database import mongo
+    from extensions.hashing import hasher
+    if args.mock:
+        # Seeding is deterministic: this copy only yields the emails to request
+        import mongomock
+        mongo.client_factory = lambda uri, **options: mongomock.MongoClient(uri)
+    emails, partners = seed(mongo.get_db(), hasher, args.users, args.messages)
+    hasher.shutdown()
+
+    rng = random.Random(7)
+    paths = []
+    for _ in range(200):
+        email = rng.choice(emails)
+        paths += [f'/auth/conversations?email={email}',
+                  f'/auth/chat/messages/{chat_id_for(email, rng.choice(partners[email]))}',
+                  f'/auth/users?q=bench{rng.randrange(100)}']
+
+    if args.mock:
+        modes = [(mode, mock_command(mode, port, args.uri, args.users, args.messages), port)
+                 for mode, port in (('wsgi', 5101), ('asgi', 5102))]
+        print(f"mongomock, one process per mode, {args.users} users / {args.messages} messages, "
+              f"duration={args.duration}s")
+    else:
+        modes = [('wsgi', wsgi_command(5101, args.workers, args.threads), 5101),
+                 ('asgi', asgi_command(5102, args.workers), 5102)]
+        print(f"workers={args.workers} wsgi-threads={args.threads} duration={args.duration}s")
+    levels = args.concurrency or [1, 16, 64, 256]
+
+    print(f"{'mode':<6}{'conns':>7}{'2xx/s':>10}{'p50 ms':>10}{'p99 ms':>10}  failures")
+    failed = False
+    for mode, command, port in modes:
+        server = subprocess.Popen(command, cwd=BACKEND, env=env)
+        try:
+            wait_until_up(port, timeout=120 if args.mock else 30)
+            for concurrency in levels:
+                rate, p50, p99, failures = asyncio.run(load(port, paths, concurrency, args.duration))
+                failed = failed or bool(failures)
+                print(f"{mode:<6}{concurrency:>7}{rate:>10.1f}{p50:>10.2f}{p99:>10.2f}  "
+                      f"{dict(failures) or '-'}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    if failed:
+        print("\nFAILED: some requests did not get a 2xx response")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import click
+from flask.cli import AppGroup
+from extensions.database import mongo
+from extensions.hashing import hasher
+from models.conversation import rebuild_inbox
+from models.user import normalize_users
+from models.bulk import (
+    TransferReport, Checkpoint, detect_format, read_rows, import_users, import_messages,
+    export_users, export_messages
+)
+
+inbox_cli = AppGroup('inbox', help='Maintain the precomputed conversation inbox.')
+users_cli = AppGroup('users', help='Maintain user documents.')
+messages_cli = AppGroup('messages', help='Import and export chat messages.')
+
+FORMAT_OPTION = click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+                             help='File format; by default .csv files are CSV and anything else NDJSON.')
+BATCH_OPTION = click.option('--batch-size', default=1000, show_default=True, help='Rows per write / checkpoint.')
+RESUME_OPTION = click.option('--resume', is_flag=True, help='Continue from the checkpoint of an interrupted run.')
+CHECKPOINT_OPTION = click.option('--checkpoint', help='Checkpoint file (default: <path>.checkpoint).')
+
+
+def _checkpoint(path, checkpoint, resume):
+    try:
+        return Checkpoint(checkpoint or f"{path}.checkpoint", path, resume=resume)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+
+@inbox_cli.command('backfill')
+@click.option('--batch-size', default=1000, show_default=True, help='Messages read / entries written per batch.')
+def backfill_inbox(batch_size):
+    """Rebuild the conversations read model from all messages.
+
+    Run it before /auth/conversations serves the read model: only messages
+    saved since node started upserting conversations are in it otherwise.
+    """
+    written = rebuild_inbox(mongo.get_db(), batch_size=batch_size)
+    click.echo(f"Inbox rebuilt: {written} conversation entries written.")
+
+
+@users_cli.command('normalize')
+@click.option('--batch-size', default=1000, show_default=True, help='Users updated per batch.')
+def normalize(batch_size):
+    """Backfill the lowercase search fields on existing users."""
+    updated = normalize_users(mongo.get_db(), batch_size=batch_size)
+    click.echo(f"Search fields added to {updated} users.")
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@FORMAT_OPTION
+@BATCH_OPTION
+@RESUME_OPTION
+@CHECKPOINT_OPTION
+def import_users_command(path, fmt, batch_size, resume, checkpoint):
+    """
+    Import users (email, nickname, password or password_hash, avatarUrl).
+    Existing emails are skipped; plain passwords are hashed on the
+    PASSWORD_HASH_WORKERS hashing pool.
+    """
+    report = TransferReport()
+    try:
+        import_users(mongo.get_db(), read_rows(path, detect_format(path, fmt)), hasher.hash_many,
+                     batch_size, _checkpoint(path, checkpoint, resume), report)
+    finally:
+        hasher.shutdown()
+    click.echo(report.summary())
+
+
+@users_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False))
+@FORMAT_OPTION
+@BATCH_OPTION
+@RESUME_OPTION
+@CHECKPOINT_OPTION
+@click.option('--include-password-hashes', is_flag=True,
+              help='Also export password_hash, so the file can be imported elsewhere.')
+def export_users_command(path, fmt, batch_size, resume, checkpoint, include_password_hashes):
+    """Export users to an NDJSON or CSV file."""
+    report = export_users(mongo.get_db(), path, detect_format(path, fmt), batch_size,
+                          _checkpoint(path, checkpoint, resume), TransferReport(),
+                          include_password_hashes=include_password_hashes)
+    click.echo(report.summary())
+
+
+@messages_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@FORMAT_OPTION
+@BATCH_OPTION
+@RESUME_OPTION
+@CHECKPOINT_OPTION
+def import_messages_command(path, fmt, batch_size, resume, checkpoint):
+    """
+    Import messages (chatId, sender, recipient, message and/or file,
+    timestamp, optional _id). Run `flask inbox backfill` afterwards.
+    """
+    report = import_messages(mongo.get_db(), read_rows(path, detect_format(path, fmt)), batch_size,
+                             _checkpoint(path, checkpoint, resume), TransferReport())
+    click.echo(report.summary())
+
+
+@messages_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False))
+@FORMAT_OPTION
+@BATCH_OPTION
+@RESUME_OPTION
+@CHECKPOINT_OPTION
+@click.option('--chat-id', help='Only this chat.')
+def export_messages_command(path, fmt, batch_size, resume, checkpoint, chat_id):
+    """Export messages to an NDJSON or CSV file, in _id order."""
+    report = export_messages(mongo.get_db(), path, detect_format(path, fmt), batch_size,
+                             _checkpoint(path, checkpoint, resume), TransferReport(), chat_id=chat_id)
+    click.echo(report.summary())
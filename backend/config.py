@@ -1,8 +1,67 @@
 import os
 
 class Config:
-    SECRET_KEY = os.getenv('SECRET_KEY')
+    SECRET_KEY = os.getenv('SECRET_KEY', 'fallback_secret_key')
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
     MONGO_URI = os.getenv('MONGO_URI')
+    CORS_ORIGINS = [
+        "http://127.0.0.1:5173",
+        "http://localhost:5173"
+    ]
+    # "wsgi" serves app.py's Flask app, "asgi" the async app in asgi.py
+    SERVING_MODE = os.getenv('SERVING_MODE', 'wsgi')
+    # MongoClient pool / timeouts (extensions/database.py). Size the pool per
+    # server worker process: each gunicorn worker gets its own client.
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zlib')
+    # Request instrumentation (extensions/instrumentation.py), exported on
+    # /metrics. INSTRUMENTATION_ENABLED=0 turns it off entirely.
+    INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', '1') == '1'
+    INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('INSTRUMENTATION_SAMPLE_RATE', 1.0))
+    # Substring user search through an in-process trigram index (models/user.py)
+    USER_SEARCH_NGRAM = os.getenv('USER_SEARCH_NGRAM') == '1'
+    # LRU + TTL cache of user profiles (extensions/cache.py). Each process has
+    # its own; /auth/user/invalidate (called by node on avatar upload) clears
+    # only the one that serves it, so the TTL bounds how stale the others get.
+    # Callers of that endpoint must send CACHE_INVALIDATE_TOKEN in the
+    # X-Cache-Invalidate-Token header; unset, the endpoint is disabled.
+    CACHE_INVALIDATE_TOKEN = os.getenv('CACHE_INVALIDATE_TOKEN')
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 30))
+    # Password hashing (extensions/hashing.py). Any werkzeug method spec, e.g.
+    # "scrypt:32768:8:1" or "pbkdf2:sha256:600000"; existing hashes are
+    # upgraded on the next successful login when this changes.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # "thread" or "process"; see PasswordHasher for why threads are the default
+    PASSWORD_HASH_POOL = os.getenv('PASSWORD_HASH_POOL', 'thread')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    # Token bucket rate limits per endpoint (extensions/rate_limit.py), keyed
+    # by client IP and, for "account", by the email in the request body.
+    # RATE_LIMIT_STORAGE = "mongo" shares buckets across workers and hosts.
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'memory')
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    # Number of trusted proxies in front of the app (e.g. 1 on Vercel or
+    # behind one nginx); the client IP is the X-Forwarded-For entry the
+    # outermost of them appended. 0 uses the socket address.
+    RATE_LIMIT_PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS', 0))
+    RATE_LIMITS = {
+        'auth.login': {'ip': '30/minute', 'account': '10/minute'},
+        'auth.register': {'ip': '10/minute', 'account': '5/minute'},
+        'auth.search_users': {'ip': '120/minute'},
+    }
+    # Response compression (extensions/compression.py): gzip, or br when the
+    # brotli package is installed, for JSON bodies of at least COMPRESS_MIN_SIZE
+    # bytes and for NDJSON streams.
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_BR_QUALITY = int(os.getenv('COMPRESS_BR_QUALITY', 4))
 
 
 class DevelopmentConfig(Config):
@@ -11,8 +70,18 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    PASSWORD_HASH_WORKERS = 0
     MONGO_URI = os.getenv('MONGO_TEST_URI')
 
 
 class ProductionConfig(Config):
     DEBUG = False
+
+
+# create_app(config_name) / FLASK_CONFIG -> config class
+config_by_name = {
+    'default': Config,
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig
+}
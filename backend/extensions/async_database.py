@@ -0,0 +1,54 @@
+import inspect
+import os
+from extensions.database import MongoDB, INDEXES
+
+
+class AsyncMongoDB(MongoDB):
+    """
+    MongoDB for the async (ASGI) serving mode: same settings and metrics,
+    but backed by pymongo's AsyncMongoClient, so get_db() returns an
+    AsyncDatabase whose operations are awaited.
+    """
+
+    def connect(self):
+        # Creating an AsyncMongoClient does no I/O; indexes are ensured from
+        # the app's before_serving hook via ensure_indexes_async.
+        with self.lock:
+            if self.client is not None and self.pid == os.getpid():
+                return self.db
+            if self.mongo_uri is None:
+                raise RuntimeError("MongoDB is not initialized. Call init_app first.")
+
+            client_factory = self.client_factory
+            if client_factory is None:
+                from pymongo import AsyncMongoClient as client_factory
+            self.client = client_factory(self.mongo_uri, **self._client_options())
+            self.db = self.client[self.db_name]
+            self.pid = os.getpid()
+            return self.db
+
+    async def ensure_indexes_async(self):
+        if self.indexes_ensured:
+            return
+        db = self.get_db()
+        for collection, keys, options in INDEXES:
+            await db[collection].create_index(keys, **options)
+        self.indexes_ensured = True
+
+    async def ping_async(self):
+        try:
+            await self.get_db().command('ping')
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        if self.client is not None and self.pid == os.getpid():
+            closed = self.client.close()
+            if inspect.isawaitable(closed):  # pymongo async; Motor's close() is sync
+                await closed
+        self.client = None
+        self.db = None
+
+
+async_mongo = AsyncMongoDB()
@@ -0,0 +1,78 @@
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/html'}
+
+
+class Compression:
+    """
+    Negotiates gzip (and br, when the brotli package is installed) from
+    Accept-Encoding. Buffered responses are compressed when they reach
+    COMPRESS_MIN_SIZE bytes; streamed responses (NDJSON history) are
+    compressed chunk by chunk as they are sent.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+        self.app = app
+        app.after_request(self._after_request)
+
+    def _encoding(self):
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def _after_request(self, response):
+        config = self.app.config
+        if (not config['COMPRESS_ENABLED'] or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers or response.status_code < 200
+                or response.status_code in (204, 304) or response.direct_passthrough):
+            return response
+
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+            return response
+
+        body = response.get_data()
+        if len(body) < config['COMPRESS_MIN_SIZE']:
+            return response
+        if encoding == 'br':
+            body = brotli.compress(body, quality=config['COMPRESS_BR_QUALITY'])
+        else:
+            body = gzip.compress(body, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.app.config['COMPRESS_BR_QUALITY'])
+            compress, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+
+compression = Compression()
@@ -1,29 +1,126 @@
-from pymongo import MongoClient
+import os
+import threading
 from flask import current_app
+from extensions.mongo_metrics import MongoMetrics, event_listener
+
+# pymongo.ASCENDING / DESCENDING; pymongo itself is imported on first connect
+ASCENDING = 1
+DESCENDING = -1
+
+# (collection, keys, options) ensured on first connect
+INDEXES = [
+    # Chat history is read by chatId in (timestamp, _id) order; see models/message.py
+    ("messages", [("chatId", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+     {"name": "chatId_timestamp"}),
+    # Login/register lookups and the upserts of a bulk user import (models/bulk.py)
+    ("users", [("email", ASCENDING)], {}),
+    # Prefix search on normalized fields; see models/user.py
+    ("users", [("nicknameLower", ASCENDING)], {}),
+    ("users", [("emailLower", ASCENDING)], {}),
+    # Inbox read model; see models/conversation.py. Same key as the
+    # mongoose Conversation schema so both backends agree on it.
+    ("conversations", [("user", ASCENDING), ("participant", ASCENDING)], {}),
+    ("conversations", [("user", ASCENDING), ("timestamp", DESCENDING)], {}),
+    # Shared rate limit buckets expire once idle long enough to be full again;
+    # see extensions/rate_limit.py
+    ("rate_limits", [("expiresAt", ASCENDING)], {"expireAfterSeconds": 0}),
+]
+
 
 class MongoDB:
-    def __init__(self):
+    def __init__(self, client_factory=None):
+        # client_factory lets tests swap in a stand-in such as mongomock.MongoClient
+        self.client_factory = client_factory
         self.client = None
         self.db = None
+        self.mongo_uri = None
+        self.db_name = None
+        self.client_options = {}
+        self.pid = None
+        self.indexes_ensured = False
+        self.lock = threading.Lock()
+        self.metrics = MongoMetrics()
+        self.listener = None
 
     def init_app(self, app):
         mongo_uri = app.config.get('MONGO_URI')
         if not mongo_uri:
             raise ValueError("MONGO_URI is not set in configuration")
 
-        # Initialize MongoDB client
-        self.client = MongoClient(mongo_uri)
         db_name = mongo_uri.split('/')[-1].split('?')[0]  # Extract database name
         if not db_name:
             raise ValueError("Database name is missing in MONGO_URI")
 
-        self.db = self.client[db_name]
+        self.mongo_uri = mongo_uri
+        self.db_name = db_name
+        self.client_options = {
+            'maxPoolSize': app.config.get('MONGO_MAX_POOL_SIZE', 100),
+            'minPoolSize': app.config.get('MONGO_MIN_POOL_SIZE', 0),
+            'waitQueueTimeoutMS': app.config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+            'serverSelectionTimeoutMS': app.config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000)
+        }
+        compressors = app.config.get('MONGO_COMPRESSORS')
+        if compressors:
+            self.client_options['compressors'] = compressors
+
+        # The client itself is created on first use (see connect)
+        self.client = None
+        self.db = None
+        self.pid = None
+        self.indexes_ensured = False
+
+    def connect(self):
+        """
+        Creates the client on first use in each process. Pre-fork servers
+        (gunicorn) import the app in the master, so connecting there would
+        share sockets between workers; connecting lazily, and again whenever
+        the pid changes, gives every worker its own pool.
+        """
+        with self.lock:
+            if self.client is None or self.pid != os.getpid():
+                if self.mongo_uri is None:
+                    raise RuntimeError("MongoDB is not initialized. Call init_app first.")
+
+                client_factory = self.client_factory
+                if client_factory is None:
+                    from pymongo import MongoClient as client_factory
+                self.client = client_factory(self.mongo_uri, **self._client_options())
+                self.db = self.client[self.db_name]
+                self.pid = os.getpid()
+
+            if not self.indexes_ensured:
+                # Stays False if this raises, so the next get_db() tries again
+                self.ensure_indexes()
+                self.indexes_ensured = True
+            return self.db
+
+    def _client_options(self):
+        if self.listener is None:
+            self.listener = event_listener(self.metrics)
+        return dict(self.client_options, event_listeners=[self.listener])
+
+    def ensure_indexes(self):
+        for collection, keys, options in INDEXES:
+            self.db[collection].create_index(keys, **options)
 
     def get_db(self):
-        if self.db is None:
-            raise RuntimeError("MongoDB is not initialized. Call init_app first.")
+        if self.db is None or self.pid != os.getpid() or not self.indexes_ensured:
+            return self.connect()
         return self.db
 
+    def ping(self):
+        """
+        Readiness check: True if a server answers within the selection timeout.
+        """
+        try:
+            self.get_db().command('ping')
+            return True
+        except Exception:
+            return False
+
+    def stats(self):
+        return dict(self.metrics.snapshot(), options=dict(self.client_options))
+
 
 # Create a global MongoDB instance
 mongo = MongoDB()
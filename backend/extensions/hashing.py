@@ -0,0 +1,158 @@
+import math
+import os
+import threading
+from itertools import repeat
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """
+    Raised when the hashing pool already has its maximum of pending jobs, or
+    a hash didn't finish within PASSWORD_HASH_TIMEOUT. Routes answer 429 with
+    `retry_after` as the Retry-After header.
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs password hashing (a CPU-bound KDF) on a bounded pool so a burst of
+    logins can't pin every request thread. Callers still wait for their own
+    result, but at most `workers + queue_size` hashes are in flight; beyond
+    that HasherBusy is raised straight away (routes answer 429). A slot is
+    only freed when its hash has actually finished, even if the caller gave
+    up waiting after PASSWORD_HASH_TIMEOUT.
+
+    PASSWORD_HASH_POOL picks the pool: "thread" (the default; hashlib's
+    scrypt and pbkdf2 release the GIL, and it works where multiprocessing
+    doesn't, e.g. AWS Lambda / Vercel have no /dev/shm) or "process", which
+    falls back to threads when a process pool can't be created. With
+    PASSWORD_HASH_WORKERS = 0 hashing runs inline, e.g. for tests.
+    """
+
+    def __init__(self):
+        self.method = 'scrypt:32768:8:1'
+        self.pool = 'thread'
+        self.workers = 0
+        self.queue_size = 0
+        self.timeout = None
+        self.executor = None
+        self.pid = None
+        self.slots = None
+        self.canonical_method = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.pool = app.config.get('PASSWORD_HASH_POOL', self.pool)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', self.queue_size)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self.slots = threading.BoundedSemaphore(self.workers + self.queue_size) if self.workers else None
+        self.canonical_method = None
+        self.shutdown()
+
+    def _new_executor(self):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        if self.pool == 'process':
+            try:
+                return ProcessPoolExecutor(max_workers=self.workers)
+            except (OSError, NotImplementedError):
+                # No working multiprocessing semaphores (OSError 38 without /dev/shm)
+                self.pool = 'thread'
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+
+    def _get_executor(self):
+        # Created on first use, and again in each forked server worker, so
+        # pre-fork servers never share a pool with their master.
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                self.executor = self._new_executor()
+                self.pid = os.getpid()
+            return self.executor
+
+    def _submit(self, fn, *args):
+        slots = self.slots
+        if not slots.acquire(blocking=False):
+            raise HasherBusy("Password hashing pool is saturated")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # Freed when the hash is done, not when the caller stops waiting
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _timed_out(self):
+        return HasherBusy("Password hashing timed out", retry_after=math.ceil(self.timeout or 1))
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        from concurrent.futures import TimeoutError as FutureTimeout
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise self._timed_out()
+
+    async def _run_async(self, fn, *args):
+        # Same limits as _run, but the event loop keeps serving while we wait.
+        # asyncio is only imported here: the WSGI app never needs it.
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if not self.workers:
+            return await loop.run_in_executor(None, fn, *args)
+        future = self._submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    async def hash_async(self, password):
+        return await self._run_async(generate_password_hash, password, self.method)
+
+    async def verify_async(self, password_hash, password):
+        return await self._run_async(check_password_hash, password_hash, password)
+
+    def hash_many(self, passwords):
+        """
+        Hashes a batch (bulk imports) spread over the whole pool. Not subject
+        to the request queue limit, so keep it out of request handlers.
+        """
+        if not self.workers:
+            return [generate_password_hash(p, self.method) for p in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._get_executor().map(generate_password_hash, passwords,
+                                             repeat(self.method), chunksize=chunksize))
+
+    def needs_rehash(self, password_hash):
+        """
+        True if the hash was made with other parameters than PASSWORD_HASH_METHOD.
+        """
+        if self.canonical_method is None:
+            # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"), so
+            # compare against the prefix it actually writes.
+            self.canonical_method = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self.canonical_method
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+            self.pid = None
+
+
+hasher = PasswordHasher()
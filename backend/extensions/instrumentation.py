@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from flask import current_app, g, request
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches the rest
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.total_ms = 0.0
+        self.mongo_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes_total = 0
+        self.bytes_max = 0
+        self.sized = 0
+
+    def add(self, total_ms, mongo_ms, status, size):
+        self.count += 1
+        if status >= 500:
+            self.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if total_ms <= bound:
+                self.buckets[i] += 1
+                break
+        self.total_ms += total_ms
+        self.mongo_ms += mongo_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        if size is not None:
+            self.sized += 1
+            self.bytes_total += size
+            self.bytes_max = max(self.bytes_max, size)
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile.
+        """
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return self.max_ms if bound == float('inf') else bound
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'p50Ms': self.percentile(50),
+            'p99Ms': self.percentile(99),
+            'maxMs': self.max_ms,
+            'avgMs': self.total_ms / self.count,
+            'avgMongoMs': self.mongo_ms / self.count,
+            'avgPythonMs': (self.total_ms - self.mongo_ms) / self.count,
+            'avgBytes': self.bytes_total / self.sized if self.sized else None,
+            'maxBytes': self.bytes_max,
+            'histogramMs': [['+Inf' if b == float('inf') else b, n]
+                            for b, n in zip(LATENCY_BUCKETS_MS, self.buckets)]
+        }
+
+
+class Instrumentation:
+    """
+    Per-route latency histograms, Mongo vs. Python time and response sizes.
+
+    INSTRUMENTATION_ENABLED is the kill switch (read per request, so it can be
+    flipped at runtime) and INSTRUMENTATION_SAMPLE_RATE the share of requests
+    measured. Mongo time comes from the MongoMetrics command listener.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.mongo_metrics = None
+
+    def init_app(self, app, mongo_metrics=None):
+        app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.mongo_metrics = mongo_metrics
+        self.reset()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        config = current_app.config
+        if not config['INSTRUMENTATION_ENABLED'] or random.random() >= config['INSTRUMENTATION_SAMPLE_RATE']:
+            return
+        g.instrumentation_start = time.perf_counter()
+        if self.mongo_metrics is not None:
+            self.mongo_metrics.start_timer()
+
+    def _after_request(self, response):
+        start = g.pop('instrumentation_start', None)
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        status = response.status_code
+        size = None if response.is_streamed else response.content_length
+
+        # Finish on close so streamed bodies are timed until fully sent
+        def finish():
+            total_ms = (time.perf_counter() - start) * 1000
+            mongo_ms = self.mongo_metrics.stop_timer() if self.mongo_metrics is not None else 0.0
+            with self.lock:
+                stats = self.routes.get(route)
+                if stats is None:
+                    stats = self.routes[route] = RouteStats()
+                stats.add(total_ms, mongo_ms, status, size)
+
+        response.call_on_close(finish)
+        return response
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {route: stats.snapshot() for route, stats in self.routes.items()}
+
+
+instrumentation = Instrumentation()
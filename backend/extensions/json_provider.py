@@ -0,0 +1,108 @@
+from datetime import date, datetime, timezone
+from itertools import islice
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib json module
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        # pymongo hands back naive UTC datetimes; same output as orjson's OPT_NAIVE_UTC
+        if o.tzinfo is None:
+            o = o.replace(tzinfo=timezone.utc)
+        return o.isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider for Mongo documents: encodes with orjson when it is
+    installed (stdlib json otherwise), renders ObjectId as its hex string and
+    datetimes as ISO 8601 in UTC, and skips key sorting.
+    """
+
+    default = staticmethod(_default)
+    sort_keys = False
+    ensure_ascii = False
+
+    def _indent(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps_bytes(self, obj, indent=False):
+        if orjson is not None:
+            option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option)
+        if indent:
+            return super().dumps(obj, indent=2).encode()
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        # Anything beyond the formatting flask itself passes goes to json.dumps
+        if orjson is not None and set(kwargs) <= {'separators', 'indent'}:
+            return self.dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj, self._indent()) + b"\n",
+                                        mimetype=self.mimetype)
+
+    def _array_body(self, first, chunks):
+        # `first` is the already encoded first chunk, or None for []
+        if first is None:
+            yield b"[]\n"
+            return
+        yield b"[" + first
+        for chunk in chunks:
+            yield b"," + self.dumps_bytes(chunk)[1:-1]  # strip the chunk's [ ]
+        yield b"]\n"
+
+    def array_response(self, documents, chunk_size=1000):
+        """
+        A JSON array response streamed straight from an iterable such as a
+        pymongo cursor, `chunk_size` documents per encoded chunk, so only one
+        chunk is ever held, as dicts or as bytes. The first chunk is encoded
+        here, so a failing query still raises inside the view.
+        """
+        documents = iter(documents)
+        chunks = iter(lambda: list(islice(documents, chunk_size)), [])
+        first = next(chunks, None)
+        if first is not None:
+            first = self.dumps_bytes(first)[1:-1]
+        return self._app.response_class(self._array_body(first, chunks), mimetype=self.mimetype)
+
+    async def array_response_async(self, documents, chunk_size=1000):
+        """
+        array_response for an async iterable (an async cursor or generator),
+        for the Quart app.
+        """
+        documents = aiter(documents)
+
+        async def next_chunk():
+            chunk = []
+            async for document in documents:
+                chunk.append(document)
+                if len(chunk) == chunk_size:
+                    break
+            return chunk
+
+        async def body(first):
+            if not first:
+                yield b"[]\n"
+                return
+            yield b"[" + self.dumps_bytes(first)[1:-1]
+            while chunk := await next_chunk():
+                yield b"," + self.dumps_bytes(chunk)[1:-1]
+            yield b"]\n"
+
+        return self._app.response_class(body(await next_chunk()), mimetype=self.mimetype)
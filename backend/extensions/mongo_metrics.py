@@ -0,0 +1,151 @@
+import threading
+
+# The pymongo listener callbacks MongoMetrics implements
+LISTENER_EVENTS = (
+    'started', 'succeeded', 'failed',
+    'connection_checked_out', 'connection_check_out_failed', 'connection_checked_in',
+    'connection_created', 'connection_closed', 'pool_cleared', 'connection_check_out_started',
+    'connection_ready', 'pool_created', 'pool_ready', 'pool_closed'
+)
+
+
+class MongoMetrics:
+    """
+    Collects per-command latency and connection pool checkout/wait
+    statistics from pymongo events; see event_listener.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.commands = {}
+            self.pool = {
+                'connectionsCreated': 0,
+                'connectionsClosed': 0,
+                'checkedOut': 0,
+                'checkOuts': 0,
+                'checkOutFailures': 0,
+                'checkOutTimeouts': 0,
+                'checkOutWaitMsTotal': 0.0,
+                'checkOutWaitMsMax': 0.0,
+                'poolCleared': 0
+            }
+
+    # --- commands ---------------------------------------------------------
+
+    def start_timer(self):
+        """
+        Starts summing command time for the calling thread (one request);
+        sync pymongo publishes command events on the thread that ran them.
+        """
+        self.local.elapsed_ms = 0.0
+
+    def stop_timer(self):
+        elapsed = getattr(self.local, 'elapsed_ms', None)
+        self.local.elapsed_ms = None
+        return elapsed or 0.0
+
+    def _record_command(self, name, duration_ms, failed):
+        if getattr(self.local, 'elapsed_ms', None) is not None:
+            self.local.elapsed_ms += duration_ms
+        with self.lock:
+            stats = self.commands.get(name)
+            if stats is None:
+                stats = self.commands[name] = {'count': 0, 'failures': 0, 'totalMs': 0.0, 'maxMs': 0.0}
+            stats['count'] += 1
+            stats['totalMs'] += duration_ms
+            stats['maxMs'] = max(stats['maxMs'], duration_ms)
+            if failed:
+                stats['failures'] += 1
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record_command(event.command_name, event.duration_micros / 1000, False)
+
+    def failed(self, event):
+        self._record_command(event.command_name, event.duration_micros / 1000, True)
+
+    # --- connection pool --------------------------------------------------
+
+    def _record_wait(self, duration):
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self.pool['checkOutWaitMsTotal'] += wait_ms
+        self.pool['checkOutWaitMsMax'] = max(self.pool['checkOutWaitMsMax'], wait_ms)
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.pool['checkOuts'] += 1
+            self.pool['checkedOut'] += 1
+            self._record_wait(getattr(event, 'duration', None))
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.pool['checkOutFailures'] += 1
+            if event.reason == 'timeout':  # ConnectionCheckOutFailedReason.TIMEOUT
+                self.pool['checkOutTimeouts'] += 1
+            self._record_wait(getattr(event, 'duration', None))
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.pool['checkedOut'] -= 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.pool['connectionsCreated'] += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.pool['connectionsClosed'] += 1
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.pool['poolCleared'] += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self):
+        with self.lock:
+            commands = {}
+            for name, stats in self.commands.items():
+                commands[name] = dict(stats, avgMs=stats['totalMs'] / stats['count'])
+            pool = dict(self.pool)
+            pool['checkOutWaitMsAvg'] = pool['checkOutWaitMsTotal'] / pool['checkOuts'] if pool['checkOuts'] else 0.0
+            return {'commands': commands, 'pool': pool}
+
+
+def event_listener(metrics):
+    """
+    A pymongo listener forwarding events to `metrics`. pymongo only accepts
+    subclasses of its listener classes, so the class is made here, when the
+    client is created, instead of at import: importing pymongo is a large
+    part of the app's cold start, and requests like `/` never need it.
+    """
+    from pymongo import monitoring
+
+    class MetricsListener(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+        pass
+
+    for name in LISTENER_EVENTS:
+        setattr(MetricsListener, name, staticmethod(getattr(metrics, name)))
+    return MetricsListener()
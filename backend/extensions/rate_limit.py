@@ -0,0 +1,230 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class RateLimited(Exception):
+    """Raised by RateLimiter.hit when a bucket is empty; routes answer 429."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def parse_limit(limit):
+    """
+    "10/minute" -> (rate in tokens per second, burst). The bucket holds up to
+    N tokens and refills at N per period.
+    """
+    count, _, period = limit.partition('/')
+    count = int(count)
+    return count / PERIODS[period.strip().rstrip('s')], count
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in an LRU-bounded OrderedDict: O(1) per hit, and at most
+    `max_keys` buckets, the least recently used ones evicted first (an
+    evicted bucket simply starts full again). Per process only.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def take(self, key, rate, burst, cost=1):
+        """
+        Takes `cost` tokens; returns 0 if they were there, else the seconds
+        until they will be.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+        return 0 if allowed else (cost - tokens) / rate
+
+    async def take_async(self, key, rate, burst, cost=1):
+        return self.take(key, rate, burst, cost)
+
+    def stats(self):
+        return {'backend': 'memory', 'keys': len(self.buckets), 'maxKeys': self.max_keys,
+                'evictions': self.evictions}
+
+
+class MongoBucketStore:
+    """
+    Token buckets in the `rate_limits` collection, so every worker and host
+    shares one budget. Each hit is a single atomic find_one_and_update with an
+    update pipeline that refills, checks and takes in one step; idle buckets
+    are removed by the TTL index on expiresAt (see extensions/database.py).
+    `get_db` returns a sync or async (for take_async) database.
+    """
+
+    def __init__(self, get_db, collection='rate_limits'):
+        self.get_db = get_db
+        self.collection = collection
+
+    def _update(self, rate, burst, cost):
+        now = time.time()
+        refilled = {'$min': [burst, {'$add': [
+            {'$ifNull': ['$tokens', burst]},
+            {'$multiply': [{'$subtract': [now, {'$ifNull': ['$updated', now]}]}, rate]}
+        ]}]}
+        # A bucket is full again (and can go) burst / rate seconds after its last hit
+        expires = datetime.now(timezone.utc) + timedelta(seconds=burst / rate)
+        return [
+            {'$set': {'tokens': refilled, 'updated': now, 'expiresAt': expires}},
+            {'$set': {'allowed': {'$gte': ['$tokens', cost]},
+                      'tokens': {'$cond': [{'$gte': ['$tokens', cost]},
+                                           {'$subtract': ['$tokens', cost]}, '$tokens']}}}
+        ]
+
+    @staticmethod
+    def _retry_after(bucket, rate, cost):
+        return 0 if bucket['allowed'] else (cost - bucket['tokens']) / rate
+
+    def take(self, key, rate, burst, cost=1):
+        from pymongo import ReturnDocument
+        bucket = self.get_db()[self.collection].find_one_and_update(
+            {'_id': key}, self._update(rate, burst, cost), upsert=True,
+            return_document=ReturnDocument.AFTER)
+        return self._retry_after(bucket, rate, cost)
+
+    async def take_async(self, key, rate, burst, cost=1):
+        from pymongo import ReturnDocument
+        bucket = await self.get_db()[self.collection].find_one_and_update(
+            {'_id': key}, self._update(rate, burst, cost), upsert=True,
+            return_document=ReturnDocument.AFTER)
+        return self._retry_after(bucket, rate, cost)
+
+    def stats(self):
+        return {'backend': 'mongo', 'collection': self.collection}
+
+
+class RateLimiter:
+    """
+    Per-route token buckets keyed by client IP and, where the route has an
+    "account" budget, by the email in the request body. Budgets come from
+    RATE_LIMITS, e.g. {"auth.login": {"ip": "30/minute", "account": "10/minute"}};
+    routes without an entry are not limited.
+
+    RATE_LIMIT_STORAGE = "memory" keeps buckets per process; "mongo" shares
+    them between workers through MongoBucketStore. If the shared store
+    fails, requests are let through (and counted as errors).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.limits = {}
+        self.store = MemoryBucketStore()
+        self.proxy_hops = 0
+        self.logger = None
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.errors = 0
+
+    def init_app(self, app, get_db=None):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMITS', {})
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.limits = {
+            endpoint: {scope: parse_limit(limit) for scope, limit in budgets.items()}
+            for endpoint, budgets in app.config['RATE_LIMITS'].items()
+        }
+        self.proxy_hops = app.config.get('RATE_LIMIT_PROXY_HOPS', 0)
+        if app.config.get('RATE_LIMIT_STORAGE', 'memory') == 'mongo':
+            self.store = MongoBucketStore(get_db)
+        else:
+            self.store = MemoryBucketStore(app.config.get('RATE_LIMIT_MAX_KEYS', 100000))
+        self.logger = app.logger
+        self.counters = {}
+        self.errors = 0
+
+    def client_ip(self, request):
+        """
+        Behind proxies (Vercel, nginx) remote_addr is the nearest proxy. Each
+        proxy appends the address it saw to X-Forwarded-For, so the client is
+        `proxy_hops` entries from the right; entries further left are
+        whatever the client sent and can't be trusted. Like werkzeug's
+        ProxyFix, a header with fewer entries than hops is ignored.
+        """
+        if self.proxy_hops:
+            route = request.access_route
+            if 'X-Forwarded-For' in request.headers and len(route) >= self.proxy_hops:
+                return route[-self.proxy_hops]
+        return request.remote_addr
+
+    def _keys(self, endpoint, ip, account):
+        for scope, (rate, burst) in self.limits.get(endpoint, {}).items():
+            value = account if scope == 'account' else ip
+            if value:
+                yield scope, f"{endpoint}:{scope}:{value}", rate, burst
+
+    def _count(self, endpoint, scope, retry_after):
+        with self.lock:
+            counter = self.counters.setdefault(f"{endpoint}:{scope}", {'allowed': 0, 'limited': 0})
+            counter['limited' if retry_after else 'allowed'] += 1
+
+    def _error(self, e):
+        with self.lock:
+            self.errors += 1
+        self.logger.warning("Rate limit store failed, letting the request through: %s", e)
+
+    def hit(self, endpoint, ip, account=None):
+        """
+        Takes a token from each of the route's buckets; raises RateLimited
+        with the longest wait if any of them is empty.
+        """
+        if not self.enabled:
+            return
+        wait = 0
+        for scope, key, rate, burst in self._keys(endpoint, ip, account):
+            try:
+                retry_after = self.store.take(key, rate, burst)
+            except Exception as e:
+                self._error(e)
+                continue
+            self._count(endpoint, scope, retry_after)
+            wait = max(wait, retry_after)
+        if wait:
+            raise RateLimited(max(1, math.ceil(wait)))
+
+    async def hit_async(self, endpoint, ip, account=None):
+        if not self.enabled:
+            return
+        wait = 0
+        for scope, key, rate, burst in self._keys(endpoint, ip, account):
+            try:
+                retry_after = await self.store.take_async(key, rate, burst)
+            except Exception as e:
+                self._error(e)
+                continue
+            self._count(endpoint, scope, retry_after)
+            wait = max(wait, retry_after)
+        if wait:
+            raise RateLimited(max(1, math.ceil(wait)))
+
+    def needs_account(self, endpoint):
+        return self.enabled and 'account' in self.limits.get(endpoint, {})
+
+    def stats(self):
+        with self.lock:
+            return {'enabled': self.enabled, 'store': self.store.stats(), 'storeErrors': self.errors,
+                    'routes': {key: dict(counter) for key, counter in self.counters.items()}}
+
+
+rate_limiter = RateLimiter()
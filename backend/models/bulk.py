@@ -0,0 +1,356 @@
+"""
+Streaming bulk import/export of users and messages in NDJSON or CSV, used
+by the `flask users import/export` and `flask messages import/export`
+commands. Rows flow through generators and are written in unordered
+batches, so memory stays at one batch whatever the file size, and a
+checkpoint file saved after every batch lets an interrupted run resume.
+"""
+import csv
+import json
+import os
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from bson import ObjectId
+from bson.errors import InvalidId
+from models.user import normalized_fields
+
+USER_FIELDS = ['email', 'nickname', 'avatarUrl']
+MESSAGE_FIELDS = ['_id', 'chatId', 'sender', 'recipient', 'message', 'file', 'timestamp']
+# CSV has no nesting: a message's file {name, url, type} becomes three columns
+FILE_FIELDS = ['name', 'url', 'type']
+DUPLICATE_KEY = 11000
+
+
+class RowError(ValueError):
+    pass
+
+
+class TransferReport:
+    """
+    Row counters of one import or export, and its throughput.
+    """
+
+    def __init__(self, max_errors=20):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.written = 0
+        self.skipped = 0
+        self.existing = 0
+        self.rejected = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"row {line}: {error}")
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.read / elapsed if elapsed else 0.0
+        lines = [f"{self.read} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec): {self.written} written, "
+                 f"{self.existing} already present, {self.rejected} rejected"]
+        if self.skipped:
+            lines.append(f"{self.skipped} rows skipped (done before the checkpoint)")
+        lines += self.errors
+        return "\n".join(lines)
+
+
+class Checkpoint:
+    """
+    Progress of one transfer in a small JSON file, replaced atomically after
+    every batch and removed when the transfer completes.
+    """
+
+    def __init__(self, path, source, resume=False):
+        self.path = path
+        self.source = source
+        self.state = {}
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+            if self.state.get('source') != source:
+                raise ValueError(f"Checkpoint {path} belongs to {self.state.get('source')}, not {source}")
+
+    def save(self, **state):
+        self.state = dict(state, source=self.source)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def read_rows(path, fmt):
+    """
+    Yields (row number, dict) from an NDJSON or CSV file, one row at a time.
+    NDJSON lines that aren't JSON objects come through as RowError values.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for n, row in enumerate(csv.DictReader(f), start=1):
+                yield n, row
+            return
+        n = 0
+        for line in f:
+            if not line.strip():
+                continue
+            n += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield n, RowError(f"invalid JSON: {e}")
+                continue
+            yield n, row if isinstance(row, dict) else RowError("not a JSON object")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(row, field, required=True):
+    value = row.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    if not value:
+        if required:
+            raise RowError(f"{field} is required")
+        return None
+    if not isinstance(value, str):
+        raise RowError(f"{field} must be a string")
+    return value
+
+
+def parse_timestamp(value):
+    """
+    ISO 8601 (naive means UTC) or epoch milliseconds -> naive UTC datetime,
+    the way pymongo stores and returns it.
+    """
+    if value in (None, ''):
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        if isinstance(value, (int, float)) or str(value).isdigit():
+            ts = datetime.fromtimestamp(int(value) / 1000, timezone.utc)
+        else:
+            ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError, OverflowError):
+        raise RowError(f"invalid timestamp: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def user_document(row):
+    """
+    Import row -> (user document, plain password or None). Rows carry either
+    a `password` (hashed on import) or an existing werkzeug `password_hash`.
+    """
+    email = _text(row, 'email')
+    nickname = _text(row, 'nickname')
+    password = _text(row, 'password', required=False)
+    password_hash = _text(row, 'password_hash', required=False)
+    if not password and not password_hash:
+        raise RowError("password or password_hash is required")
+
+    user = {'email': email, 'nickname': nickname, **normalized_fields(email, nickname)}
+    avatar_url = _text(row, 'avatarUrl', required=False)
+    if avatar_url:
+        user['avatarUrl'] = avatar_url
+    if password_hash and not password:
+        user['password_hash'] = password_hash
+        return user, None
+    return user, password
+
+
+def message_document(row):
+    message = {
+        'chatId': _text(row, 'chatId'),
+        'sender': _text(row, 'sender'),
+        'recipient': _text(row, 'recipient'),
+        'timestamp': parse_timestamp(row.get('timestamp'))
+    }
+    text = _text(row, 'message', required=False)
+    if text:
+        message['message'] = text
+    file = row.get('file')
+    if file is None and any(row.get(f'file.{f}') for f in FILE_FIELDS):
+        file = {f: row.get(f'file.{f}') or None for f in FILE_FIELDS}
+    if file:
+        if not isinstance(file, dict):
+            raise RowError("file must be an object with name, url and type")
+        message['file'] = file
+    if not text and not message.get('file'):
+        raise RowError("message or file is required")
+    if row.get('_id'):
+        # Keeping exported ids makes re-running an import idempotent
+        try:
+            message['_id'] = ObjectId(row['_id'])
+        except (InvalidId, TypeError):
+            raise RowError(f"invalid _id: {row['_id']!r}")
+    return message
+
+
+def _import(rows, to_document, write_batch, batch_size, checkpoint, report):
+    done = checkpoint.state.get('rows', 0)
+    report.skipped = done
+    for batch in chunked(islice(rows, done, None), batch_size):
+        documents = []
+        for line, row in batch:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                documents.append(to_document(row))
+            except RowError as e:
+                report.reject(line, e)
+        if documents:
+            write_batch(documents)
+        done += len(batch)
+        report.read += len(batch)
+        checkpoint.save(rows=done)
+    checkpoint.clear()
+    return report
+
+
+def import_users(db, rows, hash_many, batch_size, checkpoint, report):
+    """
+    Inserts users that don't exist yet (by email) and leaves existing ones
+    alone, like /register. Plain passwords of a batch are hashed together
+    by `hash_many` (PasswordHasher.hash_many, i.e. across the hashing pool).
+    """
+    from pymongo import UpdateOne
+
+    def write_batch(documents):
+        by_email = {}
+        for user, password in documents:
+            by_email.setdefault(user['email'], (user, password))
+        existing = {u['email'] for u in db.users.find({'email': {'$in': list(by_email)}}, {'email': 1})}
+        new = [entry for email, entry in by_email.items() if email not in existing]
+        report.existing += len(documents) - len(new)
+
+        to_hash = [user for user, password in new if password is not None]
+        hashes = hash_many([password for user, password in new if password is not None])
+        for user, password_hash in zip(to_hash, hashes):
+            user['password_hash'] = password_hash
+        if not new:
+            return
+        # Upserts, so a user created meanwhile (or by a resumed batch) is not duplicated
+        result = db.users.bulk_write([
+            UpdateOne({'email': user['email']}, {'$setOnInsert': user}, upsert=True) for user, _ in new
+        ], ordered=False)
+        report.written += result.upserted_count
+        report.existing += len(new) - result.upserted_count
+
+    return _import(rows, user_document, write_batch, batch_size, checkpoint, report)
+
+
+def import_messages(db, rows, batch_size, checkpoint, report):
+    """
+    Inserts messages with unordered insert_many. Rows that carry an `_id`
+    already present are counted as existing; rows without one that were in
+    flight when a run was interrupted can be inserted twice on resume.
+    """
+    from pymongo.errors import BulkWriteError
+
+    def write_batch(documents):
+        try:
+            report.written += len(db.messages.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY for error in errors):
+                raise
+            report.written += e.details.get('nInserted', 0)
+            report.existing += len(errors)
+
+    return _import(rows, message_document, write_batch, batch_size, checkpoint, report)
+
+
+def _export_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return value
+
+
+def _csv_row(document, fields):
+    row = {}
+    for field in fields:
+        value = document.get(field)
+        if field == 'file':
+            for f in FILE_FIELDS:
+                row[f'file.{f}'] = (value or {}).get(f) or ''
+        else:
+            row[field] = '' if value is None else _export_value(value)
+    return row
+
+
+def _export(collection, query, fields, path, fmt, batch_size, checkpoint, report):
+    """
+    Writes the matching documents in _id order. After every batch the file
+    is flushed and its size and the last _id are checkpointed; a resumed
+    export truncates the file back to that size and carries on after that _id.
+    """
+    last_id = checkpoint.state.get('lastId')
+    offset = checkpoint.state.get('bytes')
+    if last_id:
+        query = {**query, '_id': {'$gt': ObjectId(last_id)}}
+        report.skipped = checkpoint.state.get('rows', 0)
+
+    columns = fields
+    if fmt == 'csv' and 'file' in fields:
+        columns = [f for f in fields if f != 'file'] + [f'file.{f}' for f in FILE_FIELDS]
+
+    projection = {field: 1 for field in fields}
+    cursor = collection.find(query, projection).sort('_id', 1).batch_size(batch_size)
+    with open(path, 'r+' if last_id else 'w', newline='', encoding='utf-8') as out:
+        if last_id:
+            out.truncate(offset)
+            out.seek(offset)
+        writer = csv.DictWriter(out, columns, extrasaction='ignore') if fmt == 'csv' else None
+        if writer and not last_id:
+            writer.writeheader()
+        try:
+            for batch in chunked(cursor, batch_size):
+                for document in batch:
+                    if writer:
+                        writer.writerow(_csv_row(document, fields))
+                    else:
+                        out.write(json.dumps({field: _export_value(document[field])
+                                              for field in fields if field in document},
+                                             ensure_ascii=False) + "\n")
+                out.flush()
+                report.read += len(batch)
+                report.written += len(batch)
+                checkpoint.save(lastId=str(batch[-1]['_id']), bytes=out.tell(),
+                                rows=report.skipped + report.written)
+        finally:
+            cursor.close()
+    checkpoint.clear()
+    return report
+
+
+def export_users(db, path, fmt, batch_size, checkpoint, report, include_password_hashes=False):
+    fields = USER_FIELDS + (['password_hash'] if include_password_hashes else [])
+    return _export(db.users, {}, fields, path, fmt, batch_size, checkpoint, report)
+
+
+def export_messages(db, path, fmt, batch_size, checkpoint, report, chat_id=None):
+    query = {'chatId': chat_id} if chat_id else {}
+    return _export(db.messages, query, MESSAGE_FIELDS, path, fmt, batch_size, checkpoint, report)
@@ -0,0 +1,98 @@
+"""
+Read model for the inbox: one document per (user, participant) pair, in the
+shape of node-backend/models/Conversation.js. It is written where messages
+are written: node's saveMessage upserts both participants' entries (and
+bumps the recipient's unreadCount) for every message it saves.
+
+Entries only exist for messages sent since that write path shipped, so run
+`flask inbox backfill` once, before serving /auth/conversations from here;
+re-running it later is safe and repairs entries a failed upsert missed.
+"""
+CONVERSATION_PROJECTION = {"_id": 0, "participant": 1, "chatId": 1, "lastMessage": 1,
+                           "timestamp": 1, "unreadCount": 1}
+
+
+def _last_message_text(message):
+    text = message.get('message')
+    if not text and message.get('file'):
+        return message['file'].get('name', '')
+    return text or ''
+
+
+def mark_read(db, email, participant):
+    result = db.conversations.update_one({"user": email, "participant": participant},
+                                         {"$set": {"unreadCount": 0}})
+    return result.matched_count > 0
+
+
+async def mark_read_async(db, email, participant):
+    result = await db.conversations.update_one({"user": email, "participant": participant},
+                                               {"$set": {"unreadCount": 0}})
+    return result.matched_count > 0
+
+
+def inbox_cursor(db, email, limit=None):
+    """
+    The user's conversations, most recent first, as a cursor (sync or async,
+    with the driver's db) for routes that stream straight from it; see
+    FastJSONProvider.array_response / array_response_async.
+    """
+    cursor = db.conversations.find({"user": email}, CONVERSATION_PROJECTION).sort("timestamp", -1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def get_inbox(db, email, limit=None):
+    """
+    Returns the user's conversations, most recent first.
+    """
+    return list(inbox_cursor(db, email, limit))
+
+
+def rebuild_inbox(db, batch_size=1000):
+    """
+    Rebuilds the inbox read model from `messages`, reading and writing in
+    batches of `batch_size`. Existing unread counters are kept (messages carry
+    no read state to rebuild them from). Returns the number of entries written.
+    """
+    from pymongo import UpdateOne
+    latest = {}
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db.messages.find(
+            query,
+            {"_id": 1, "chatId": 1, "sender": 1, "recipient": 1, "message": 1, "file": 1, "timestamp": 1}
+        ).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+
+        for message in batch:
+            if not message.get('sender') or not message.get('recipient'):
+                continue
+            ts = message.get('timestamp')
+            for key in ((message['sender'], message['recipient']),
+                        (message['recipient'], message['sender'])):
+                current = latest.get(key)
+                if current is None or (ts is not None and (current[1] is None or ts >= current[1])):
+                    latest[key] = (message.get('chatId'), ts, _last_message_text(message))
+
+    written = 0
+    ops = []
+    for (user, participant), (chat_id, ts, text) in latest.items():
+        ops.append(UpdateOne(
+            {"user": user, "participant": participant},
+            {"$set": {"chatId": chat_id, "lastMessage": text, "timestamp": ts},
+             "$setOnInsert": {"unreadCount": 0}},
+            upsert=True
+        ))
+        if len(ops) >= batch_size:
+            db.conversations.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        db.conversations.bulk_write(ops, ordered=False)
+        written += len(ops)
+    return written
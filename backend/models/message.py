@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Only the fields the chat window renders (plus _id, needed for cursors)
+MESSAGE_PROJECTION = {"_id": 1, "sender": 1, "recipient": 1, "message": 1, "file": 1, "timestamp": 1}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    """
+    A cursor is "<epoch millis>_<ObjectId hex>" of a message, so pages are
+    keyed on (timestamp, _id) and stay stable when timestamps collide.
+    """
+    ts = message['timestamp']
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return f"{int(ts.timestamp() * 1000)}_{message['_id']}"
+
+
+def decode_cursor(cursor):
+    try:
+        millis, oid = cursor.split('_', 1)
+        return datetime.fromtimestamp(int(millis) / 1000, timezone.utc), ObjectId(oid)
+    except (ValueError, InvalidId, OverflowError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+
+def build_page_query(chat_id, before=None, after=None):
+    """
+    Returns (filter, sort) for one page of a chat.
+
+    - after:  messages newer than the cursor, oldest first
+    - before: messages older than the cursor, newest first (caller reverses)
+    - none:   the newest messages, newest first (caller reverses)
+    """
+    query = {"chatId": chat_id}
+    if after:
+        ts, oid = decode_cursor(after)
+        query["$or"] = [
+            {"timestamp": {"$gt": ts}},
+            {"timestamp": ts, "_id": {"$gt": oid}}
+        ]
+        return query, [("timestamp", 1), ("_id", 1)]
+
+    if before:
+        ts, oid = decode_cursor(before)
+        query["$or"] = [
+            {"timestamp": {"$lt": ts}},
+            {"timestamp": ts, "_id": {"$lt": oid}}
+        ]
+    return query, [("timestamp", -1), ("_id", -1)]
+
+
+def serialize_message(message):
+    """
+    Replaces the internal _id with the opaque cursor clients page with.
+    Works in place: the documents are fresh off the cursor.
+    """
+    message['cursor'] = encode_cursor(message)
+    del message['_id']
+    return message
+
+
+def _page_cursor(db, chat_id, limit, before, after):
+    query, sort = build_page_query(chat_id, before, after)
+    return db.messages.find(query, MESSAGE_PROJECTION).sort(sort).limit(limit)
+
+
+def _finish_page(docs, after):
+    messages = [serialize_message(m) for m in docs]
+    if not after:
+        messages.reverse()
+    return messages
+
+
+def fetch_message_page(db, chat_id, limit, before=None, after=None):
+    """
+    Returns at most `limit` messages of a chat in ascending order.
+    """
+    return _finish_page(_page_cursor(db, chat_id, limit, before, after), after)
+
+
+async def fetch_message_page_async(db, chat_id, limit, before=None, after=None):
+    cursor = _page_cursor(db, chat_id, limit, before, after)
+    return _finish_page([m async for m in cursor], after)
+
+
+def _stream_cursor(db, chat_id, after, limit, batch_size):
+    query, sort = build_page_query(chat_id, after=after) if after else \
+        ({"chatId": chat_id}, [("timestamp", 1), ("_id", 1)])
+    cursor = db.messages.find(query, MESSAGE_PROJECTION).sort(sort).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def iter_messages(db, chat_id, after=None, limit=0, batch_size=500):
+    """
+    Yields messages of a chat in ascending order straight off the cursor,
+    so only one driver batch is held in memory at a time.
+    """
+    cursor = _stream_cursor(db, chat_id, after, limit, batch_size)
+    try:
+        for message in cursor:
+            yield serialize_message(message)
+    finally:
+        cursor.close()
+
+
+async def iter_messages_async(db, chat_id, after=None, limit=0, batch_size=500):
+    cursor = _stream_cursor(db, chat_id, after, limit, batch_size)
+    try:
+        async for message in cursor:
+            yield serialize_message(message)
+    finally:
+        await cursor.close()
@@ -1,6 +1,10 @@
+import re
+import threading
+import time
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from extensions.database import mongo
+from extensions.cache import profile_cache
 
 class User(UserMixin):
     def __init__(self, email, nickname=None, password=None):
@@ -17,3 +21,249 @@ def get_user_by_id(user_id):
     if not user:
         return None
     return User(email=user['email'], nickname=user['nickname'])
+
+
+DEFAULT_AVATAR_URL = './avatar.png'
+
+
+def _profile(user):
+    return {
+        'avatarUrl': user.get('avatarUrl', DEFAULT_AVATAR_URL),
+        'nickname': user.get('nickname')
+    }
+
+
+def _profiles_query(missing):
+    return {'email': {'$in': missing}}, {'_id': 0, 'email': 1, 'avatarUrl': 1, 'nickname': 1}
+
+
+def get_profiles(db, emails):
+    """
+    Returns {email: {'avatarUrl', 'nickname'}} for the emails that exist,
+    served from profile_cache where possible and otherwise with one $in query.
+    """
+    emails = list(dict.fromkeys(emails))
+    profiles = profile_cache.get_many(emails)
+    missing = [e for e in emails if e not in profiles]
+    if missing:
+        for user in db.users.find(*_profiles_query(missing)):
+            profiles[user['email']] = _profile(user)
+            profile_cache.set(user['email'], profiles[user['email']])
+    return profiles
+
+
+async def get_profiles_async(db, emails):
+    """
+    get_profiles for the async serving mode (db is a pymongo AsyncDatabase).
+    """
+    emails = list(dict.fromkeys(emails))
+    profiles = profile_cache.get_many(emails)
+    missing = [e for e in emails if e not in profiles]
+    if missing:
+        async for user in db.users.find(*_profiles_query(missing)):
+            profiles[user['email']] = _profile(user)
+            profile_cache.set(user['email'], profiles[user['email']])
+    return profiles
+
+
+# --- User search -----------------------------------------------------------
+#
+# Users carry lowercase copies of nickname/email (nicknameLower/emailLower),
+# indexed, so autocomplete is an anchored prefix scan on an index rather than
+# an unanchored regex over the whole collection. Substring matches come from
+# an optional in-process trigram index (NgramIndex).
+
+SEARCH_PROJECTION = {"_id": 1, "email": 1, "nickname": 1, "emailLower": 1, "nicknameLower": 1}
+
+
+def normalized_fields(email, nickname):
+    return {
+        'emailLower': (email or '').strip().lower(),
+        'nicknameLower': (nickname or '').strip().lower()
+    }
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _rank(user, query):
+    nickname = user.get('nicknameLower') or (user.get('nickname') or '').lower()
+    email = user.get('emailLower') or (user.get('email') or '').lower()
+    if query in (nickname, email):
+        tier = 0
+    elif nickname.startswith(query):
+        tier = 1
+    elif email.startswith(query):
+        tier = 2
+    else:
+        tier = 3
+    return (tier, len(nickname), nickname, email)
+
+
+class NgramIndex:
+    """
+    In-process trigram index over users' nickname and email for substring
+    search. Kept current incrementally: add() on register, and refresh()
+    pulls users inserted since the last _id it saw. One refresh runs at a
+    time; searches arriving meanwhile use the index as it stands.
+    """
+
+    def __init__(self, refresh_interval=30):
+        self.refresh_interval = refresh_interval
+        self.users = {}
+        self.postings = {}
+        self.last_id = None
+        self.last_refresh = None
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def add(self, user):
+        email = user['email']
+        fields = normalized_fields(email, user.get('nickname'))
+        with self.lock:
+            self._remove(email)
+            self.users[email] = {'email': email, 'nickname': user.get('nickname'), **fields}
+            for gram in _trigrams(fields['nicknameLower']) | _trigrams(fields['emailLower']):
+                self.postings.setdefault(gram, set()).add(email)
+
+    def _remove(self, email):
+        old = self.users.pop(email, None)
+        if old is None:
+            return
+        for gram in _trigrams(old['nicknameLower']) | _trigrams(old['emailLower']):
+            emails = self.postings.get(gram)
+            if emails:
+                emails.discard(email)
+                if not emails:
+                    del self.postings[gram]
+
+    def _start_refresh(self, force):
+        """
+        True if a refresh is due and this caller got to run it; the caller
+        then releases refresh_lock.
+        """
+        now = time.monotonic()
+        if not force and self.last_refresh is not None and now - self.last_refresh < self.refresh_interval:
+            return False
+        if not self.refresh_lock.acquire(blocking=False):
+            return False
+        self.last_refresh = now
+        return True
+
+    def _refresh_cursor(self, db):
+        query = {"_id": {"$gt": self.last_id}} if self.last_id is not None else {}
+        return db.users.find(query, SEARCH_PROJECTION).sort("_id", 1)
+
+    def _apply(self, user):
+        if user.get('email'):
+            self.add(user)
+        self.last_id = user['_id']
+
+    def refresh(self, db, force=False):
+        if not self._start_refresh(force):
+            return
+        try:
+            for user in self._refresh_cursor(db):
+                self._apply(user)
+        finally:
+            self.refresh_lock.release()
+
+    async def refresh_async(self, db, force=False):
+        if not self._start_refresh(force):
+            return
+        try:
+            async for user in self._refresh_cursor(db):
+                self._apply(user)
+        finally:
+            self.refresh_lock.release()
+
+    def search(self, query, limit):
+        grams = _trigrams(query)
+        if not grams:
+            return []
+        with self.lock:
+            postings = sorted((self.postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+            matches = [self.users[e] for e in candidates
+                       if query in self.users[e]['nicknameLower'] or query in self.users[e]['emailLower']]
+        return sorted(matches, key=lambda u: _rank(u, query))[:limit]
+
+
+user_search_index = NgramIndex()
+
+
+def _prefix_cursors(db, query, limit):
+    """
+    Index prefix scans on nicknameLower and emailLower, plus a case-insensitive
+    scan of nickname/email restricted (through the emailLower index) to users
+    that don't have the normalized fields yet, until `flask users normalize`
+    has backfilled them.
+    """
+    prefix = {"$regex": "^" + re.escape(query)}
+    legacy = {"$regex": "^" + re.escape(query), "$options": "i"}
+    return [db.users.find({field: prefix}, SEARCH_PROJECTION).limit(limit)
+            for field in ('nicknameLower', 'emailLower')] + [
+        db.users.find({"emailLower": None, "$or": [{"nickname": legacy}, {"email": legacy}]},
+                      SEARCH_PROJECTION).limit(limit)
+    ]
+
+
+def _ranked(found, query, ngram_index, limit):
+    if ngram_index is not None:
+        for user in ngram_index.search(query, limit):
+            found.setdefault(user['email'], user)
+    ranked = sorted(found.values(), key=lambda u: _rank(u, query))[:limit]
+    return [{'email': u['email'], 'nickname': u.get('nickname')} for u in ranked]
+
+
+def search_users(db, query, limit, ngram_index=None):
+    """
+    Returns up to `limit` users whose nickname or email starts with `query`
+    (case-insensitive), best matches first. With an ngram_index, substring
+    matches are merged in after the prefix matches.
+    """
+    query = query.strip().lower()
+    if not query:
+        return []
+
+    found = {}
+    for cursor in _prefix_cursors(db, query, limit):
+        for user in cursor:
+            found[user['email']] = user
+    if ngram_index is not None:
+        ngram_index.refresh(db)
+    return _ranked(found, query, ngram_index, limit)
+
+
+async def search_users_async(db, query, limit, ngram_index=None):
+    query = query.strip().lower()
+    if not query:
+        return []
+
+    found = {}
+    for cursor in _prefix_cursors(db, query, limit):
+        async for user in cursor:
+            found[user['email']] = user
+    if ngram_index is not None:
+        await ngram_index.refresh_async(db)
+    return _ranked(found, query, ngram_index, limit)
+
+
+def normalize_users(db, batch_size=1000):
+    """
+    Backfills nicknameLower/emailLower on users created before they existed.
+    Returns the number of users updated.
+    """
+    from pymongo import UpdateOne
+    updated = 0
+    while True:
+        batch = list(db.users.find({"emailLower": {"$exists": False}},
+                                   {"_id": 1, "email": 1, "nickname": 1}).limit(batch_size))
+        if not batch:
+            return updated
+        db.users.bulk_write([
+            UpdateOne({"_id": u['_id']}, {"$set": normalized_fields(u.get('email'), u.get('nickname'))})
+            for u in batch
+        ], ordered=False)
+        updated += len(batch)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+# config.py reads the environment when it is first imported
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/chat_test')
+os.environ.setdefault('MONGO_TEST_URI', 'mongodb://localhost:27017/chat_test')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-secret-key-with-enough-bytes')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+import pytest
+
+
+def mongomock_client(uri, **options):
+    return mongomock.MongoClient(uri)
+
+
+@pytest.fixture
+def app():
+    """
+    The app with TestingConfig, on a fresh in-memory mongomock database.
+    """
+    from app import create_app
+    from extensions.database import mongo
+
+    app = create_app('testing')
+    mongo.client_factory = mongomock_client
+    yield app
+    mongo.client_factory = None
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    from extensions.database import mongo
+    return mongo.get_db()
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+import pytest
+from models.bulk import (
+    Checkpoint, TransferReport, read_rows, import_users, import_messages, export_messages, export_users
+)
+
+
+def write_ndjson(path, rows):
+    path.write_text(''.join((row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows))
+    return str(path)
+
+
+def fake_hash_many(passwords):
+    return [f'hash:{p}' for p in passwords]
+
+
+def test_import_users_rejects_bad_rows_and_skips_existing(db, tmp_path):
+    db.users.insert_one({'email': 'old@x', 'nickname': 'Old'})
+    path = write_ndjson(tmp_path / 'users.ndjson', [
+        {'email': 'a@x', 'nickname': 'A', 'password': 'pa'},
+        {'email': 'old@x', 'nickname': 'Again', 'password': 'p'},
+        {'email': 'b@x', 'nickname': 'B', 'password_hash': 'pbkdf2:sha256:1$s$h'},
+        {'email': 'c@x', 'password': 'p'},
+        'not json',
+        '[1, 2]',
+    ])
+    checkpoint = Checkpoint(path + '.checkpoint', path)
+    report = import_users(db, read_rows(path, 'ndjson'), fake_hash_many, 2, checkpoint, TransferReport())
+
+    assert (report.read, report.written, report.existing, report.rejected) == (6, 2, 1, 3)
+    assert [e.split(':')[0] for e in report.errors] == ['row 4', 'row 5', 'row 6']
+    assert db.users.find_one({'email': 'a@x'})['password_hash'] == 'hash:pa'
+    assert db.users.find_one({'email': 'a@x'})['nicknameLower'] == 'a'
+    assert db.users.find_one({'email': 'b@x'})['password_hash'] == 'pbkdf2:sha256:1$s$h'
+    assert db.users.find_one({'email': 'old@x'})['nickname'] == 'Old'
+    assert not (tmp_path / 'users.ndjson.checkpoint').exists()
+
+
+def test_interrupted_import_resumes_from_the_checkpoint(db, tmp_path):
+    path = write_ndjson(tmp_path / 'users.ndjson',
+                        [{'email': f'u{i}@x', 'nickname': f'U{i}', 'password': 'p'} for i in range(5)])
+    calls = []
+
+    def failing_hash_many(passwords):
+        calls.append(len(passwords))
+        if len(calls) == 2:
+            raise RuntimeError("interrupted")
+        return fake_hash_many(passwords)
+
+    with pytest.raises(RuntimeError):
+        import_users(db, read_rows(path, 'ndjson'), failing_hash_many, 2,
+                     Checkpoint(path + '.checkpoint', path), TransferReport())
+    assert json.loads((tmp_path / 'users.ndjson.checkpoint').read_text()) == {'rows': 2, 'source': path}
+
+    with pytest.raises(ValueError):
+        Checkpoint(path + '.checkpoint', 'other.ndjson', resume=True)
+
+    report = import_users(db, read_rows(path, 'ndjson'), fake_hash_many, 2,
+                          Checkpoint(path + '.checkpoint', path, resume=True), TransferReport())
+    assert (report.skipped, report.read, report.written) == (2, 3, 3)
+    assert db.users.count_documents({}) == 5
+
+
+def test_message_export_then_reimport_is_idempotent(db, tmp_path):
+    db.messages.insert_many([{'chatId': 'a:b', 'sender': 'a', 'recipient': 'b', 'message': f'm{i}',
+                              'timestamp': datetime(2025, 1, 1, 12, i)} for i in range(5)])
+    path = str(tmp_path / 'messages.csv')
+    report = export_messages(db, path, 'csv', 2, Checkpoint(path + '.checkpoint', path), TransferReport())
+    assert report.written == 5
+
+    report = import_messages(db, read_rows(path, 'csv'), 2, Checkpoint(path + '.checkpoint', path),
+                             TransferReport())
+    assert (report.written, report.existing, report.rejected) == (0, 5, 0)
+    assert db.messages.count_documents({}) == 5
+    assert db.messages.find_one({'message': 'm3'})['timestamp'] == datetime(2025, 1, 1, 12, 3)
+
+
+def test_interrupted_export_truncates_and_resumes(db, tmp_path):
+    db.users.insert_many([{'email': f'u{i}@x', 'nickname': f'U{i}'} for i in range(5)])
+    path = str(tmp_path / 'users.ndjson')
+    checkpoint = Checkpoint(path + '.checkpoint', path)
+    original_save = checkpoint.save
+
+    def save_then_fail(**state):
+        original_save(**state)
+        if state['rows'] == 2:
+            # a partial row written after the checkpoint, then the process dies
+            with open(path, 'a') as f:
+                f.write('{"email": "half')
+            raise KeyboardInterrupt
+
+    checkpoint.save = save_then_fail
+    with pytest.raises(KeyboardInterrupt):
+        export_users(db, path, 'ndjson', 2, checkpoint, TransferReport())
+
+    report = export_users(db, path, 'ndjson', 2, Checkpoint(path + '.checkpoint', path, resume=True),
+                          TransferReport())
+    assert (report.skipped, report.written) == (2, 3)
+    rows = [json.loads(line) for line in open(path)]
+    assert [r['email'] for r in rows] == [f'u{i}@x' for i in range(5)]
+    assert 'password_hash' not in rows[0]
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+from models.conversation import rebuild_inbox
+
+START = datetime(2025, 1, 1, 12, 0)
+
+
+def message(sender, recipient, text, minutes, **fields):
+    return {'chatId': ':'.join(sorted((sender, recipient))), 'sender': sender, 'recipient': recipient,
+            'message': text, 'timestamp': START + timedelta(minutes=minutes), **fields}
+
+
+def test_backfill_then_inbox(client, db):
+    db.messages.insert_many([
+        message('a', 'b', 'first', 0),
+        message('b', 'a', 'reply', 1),
+        message('a', 'c', '', 2, file={'name': 'cat.png', 'url': 'u', 'type': 'image'}),
+    ])
+    db.conversations.insert_one({'user': 'b', 'participant': 'a', 'unreadCount': 3})
+
+    assert rebuild_inbox(db, batch_size=2) == 4
+    assert rebuild_inbox(db) == 4
+    assert db.conversations.count_documents({}) == 4
+
+    inbox = client.get('/auth/conversations?email=a').json
+    assert [(c['participant'], c['lastMessage']) for c in inbox] == [('c', 'cat.png'), ('b', 'reply')]
+    assert inbox[1]['unreadCount'] == 0
+
+    # the backfill keeps unread counters it can't rebuild
+    assert client.get('/auth/conversations?email=b').json[0]['unreadCount'] == 3
+    assert client.post('/auth/conversations/read', json={'email': 'b', 'participant': 'a'}).status_code == 200
+    assert client.get('/auth/conversations?email=b').json[0]['unreadCount'] == 0
+    assert client.post('/auth/conversations/read', json={'email': 'b', 'participant': 'z'}).status_code == 404
+
+
+def test_inbox_requires_an_email(client):
+    assert client.get('/auth/conversations').status_code == 400
+
+
+def test_no_public_write_endpoint(client):
+    assert client.post('/auth/conversations/message', json={}).status_code in (404, 405)
@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+import mongomock
+import pytest
+from flask import Flask
+from pymongo import monitoring
+from extensions import database
+from extensions.database import MongoDB, INDEXES
+from extensions.mongo_metrics import MongoMetrics, event_listener
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config['MONGO_URI'] = 'mongodb://localhost:27017/chat_test'
+    app.config.update(config)
+    return app
+
+
+class RecordingFactory:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, uri, **options):
+        self.calls.append((uri, options))
+        return mongomock.MongoClient(uri)
+
+
+def test_connects_lazily_on_first_use():
+    factory = RecordingFactory()
+    mongo = MongoDB(client_factory=factory)
+    mongo.init_app(make_app())
+    assert mongo.client is None and factory.calls == []
+
+    db = mongo.get_db()
+    assert db.name == 'chat_test'
+    assert mongo.get_db() is db
+    assert len(factory.calls) == 1
+
+
+def test_reconnects_when_the_pid_changes(monkeypatch):
+    factory = RecordingFactory()
+    mongo = MongoDB(client_factory=factory)
+    mongo.init_app(make_app())
+    mongo.get_db()
+
+    monkeypatch.setattr(database.os, 'getpid', lambda: -1)
+    mongo.get_db()
+    assert len(factory.calls) == 2
+    assert mongo.pid == -1
+
+
+def test_pool_options_come_from_config():
+    factory = RecordingFactory()
+    mongo = MongoDB(client_factory=factory)
+    mongo.init_app(make_app(MONGO_MAX_POOL_SIZE=7, MONGO_MIN_POOL_SIZE=2, MONGO_WAIT_QUEUE_TIMEOUT_MS=123,
+                            MONGO_SERVER_SELECTION_TIMEOUT_MS=456, MONGO_COMPRESSORS='zlib'))
+    mongo.get_db()
+
+    uri, options = factory.calls[0]
+    assert uri == 'mongodb://localhost:27017/chat_test'
+    assert options['maxPoolSize'] == 7
+    assert options['minPoolSize'] == 2
+    assert options['waitQueueTimeoutMS'] == 123
+    assert options['serverSelectionTimeoutMS'] == 456
+    assert options['compressors'] == 'zlib'
+    assert isinstance(options['event_listeners'][0], monitoring.CommandListener)
+    assert 'event_listeners' not in mongo.stats()['options']
+
+
+def test_index_creation_is_retried_after_a_failure(monkeypatch):
+    mongo = MongoDB(client_factory=RecordingFactory())
+    mongo.init_app(make_app())
+    calls = []
+
+    def failing_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("index build failed")
+        MongoDB.ensure_indexes(mongo)
+
+    monkeypatch.setattr(mongo, 'ensure_indexes', failing_once)
+    with pytest.raises(RuntimeError):
+        mongo.get_db()
+    assert not mongo.indexes_ensured
+
+    db = mongo.get_db()
+    assert mongo.indexes_ensured
+    assert len(calls) == 2
+    assert len(db.users.index_information()) > 1
+    for collection in {c for c, _, _ in INDEXES}:
+        assert db[collection].index_information()
+
+
+def test_ready_and_metrics(client):
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.json == {'status': 'ok'}
+
+    client.get('/').close()
+    metrics = client.get('/metrics').json
+    assert set(metrics) == {'routes', 'mongo', 'profileCache', 'rateLimits'}
+    assert set(metrics['mongo']) == {'commands', 'pool', 'options'}
+    assert metrics['mongo']['options']['maxPoolSize'] == 50
+    assert metrics['routes']['/']['count'] == 1
+
+
+def test_ready_reports_an_unreachable_database(app, client):
+    from extensions.database import mongo
+
+    def unreachable(uri, **options):
+        raise ConnectionError("no server")
+
+    mongo.client_factory = unreachable
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.json == {'status': 'unavailable'}
+
+
+def test_listener_counters():
+    metrics = MongoMetrics()
+    listener = event_listener(metrics)
+    assert isinstance(listener, monitoring.ConnectionPoolListener)
+
+    metrics.start_timer()
+    listener.succeeded(SimpleNamespace(command_name='find', duration_micros=2000))
+    listener.failed(SimpleNamespace(command_name='find', duration_micros=4000))
+    assert metrics.stop_timer() == 6.0
+
+    listener.connection_created(SimpleNamespace())
+    listener.connection_checked_out(SimpleNamespace(duration=0.003))
+    listener.connection_checked_in(SimpleNamespace())
+    listener.connection_check_out_failed(SimpleNamespace(reason='timeout', duration=0.5))
+
+    snapshot = metrics.snapshot()
+    assert snapshot['commands']['find'] == {'count': 2, 'failures': 1, 'totalMs': 6.0, 'maxMs': 4.0, 'avgMs': 3.0}
+    pool = snapshot['pool']
+    assert pool['connectionsCreated'] == 1
+    assert pool['checkOuts'] == 1 and pool['checkedOut'] == 0
+    assert pool['checkOutFailures'] == 1 and pool['checkOutTimeouts'] == 1
+    assert pool['checkOutWaitMsMax'] == 500.0
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import concurrent.futures
+import pytest
+from flask import Flask
+from extensions.hashing import PasswordHasher, HasherBusy
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+def make_hasher(**config):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD=METHOD, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=0, **config)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    return hasher
+
+
+def test_thread_pool_by_default():
+    hasher = make_hasher()
+    password_hash = hasher.hash('secret')
+    assert hasher.verify(password_hash, 'secret')
+    assert not hasher.verify(password_hash, 'wrong')
+    assert isinstance(hasher.executor, concurrent.futures.ThreadPoolExecutor)
+    assert hasher.hash_many(['a', 'b']) and not hasher.needs_rehash(password_hash)
+    hasher.shutdown()
+
+
+def test_process_pool_falls_back_to_threads(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise OSError(38, "Function not implemented")
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', unavailable)
+    hasher = make_hasher(PASSWORD_HASH_POOL='process')
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+    assert hasher.pool == 'thread'
+    assert isinstance(hasher.executor, concurrent.futures.ThreadPoolExecutor)
+    hasher.shutdown()
+
+
+def test_timeout_keeps_the_slot_until_the_hash_finishes():
+    hasher = make_hasher(PASSWORD_HASH_TIMEOUT=0.05)
+    release = threading.Event()
+
+    with pytest.raises(HasherBusy) as timed_out:
+        hasher._run(release.wait, 5)
+    assert timed_out.value.retry_after == 1
+
+    # the job is still running, so its slot is still taken
+    with pytest.raises(HasherBusy, match='saturated'):
+        hasher._run(lambda: None)
+
+    release.set()
+    hasher.shutdown()
+    assert hasher._run(lambda: 'ok') == 'ok'
+    hasher.shutdown()
+
+
+def test_async_timeout_raises_busy():
+    hasher = make_hasher(PASSWORD_HASH_TIMEOUT=0.05)
+    release = threading.Event()
+    with pytest.raises(HasherBusy):
+        asyncio.run(hasher._run_async(release.wait, 5))
+    release.set()
+    hasher.shutdown()
+    assert asyncio.run(hasher._run_async(lambda: 'ok')) == 'ok'
+    hasher.shutdown()
+
+
+def test_busy_hasher_answers_429_with_retry_after(client, monkeypatch):
+    from extensions.hashing import hasher
+
+    def busy(password):
+        raise HasherBusy("Password hashing timed out", retry_after=10)
+
+    monkeypatch.setattr(hasher, 'hash', busy)
+    response = client.post('/auth/register', json={'email': 'a@x', 'nickname': 'A',
+                                                   'password': 'p', 're_password': 'p'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
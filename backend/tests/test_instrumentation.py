@@ -0,0 +1,62 @@
+from datetime import datetime
+import pytest
+from extensions.instrumentation import RouteStats, instrumentation
+
+
+def stats_with(latencies):
+    stats = RouteStats()
+    for ms in latencies:
+        stats.add(ms, 0.0, 200, None)
+    return stats
+
+
+def test_percentiles_are_bucket_upper_bounds():
+    stats = stats_with([1] * 50 + [1.01] * 49 + [20000])
+    assert stats.buckets[:2] == [50, 49]
+    assert stats.percentile(50) == 1
+    assert stats.percentile(51) == 2
+    assert stats.percentile(99) == 2
+    # the open-ended last bucket reports the observed maximum
+    assert stats.percentile(100) == 20000
+    assert stats_with([]).percentile(50) == 0.0
+
+
+def test_snapshot_counts_errors_and_sizes():
+    stats = RouteStats()
+    stats.add(3, 1, 200, 100)
+    stats.add(7, 2, 500, None)
+    snapshot = stats.snapshot()
+    assert (snapshot['count'], snapshot['errors'], snapshot['avgMs'], snapshot['avgMongoMs']) == (2, 1, 5, 1.5)
+    assert (snapshot['avgBytes'], snapshot['maxBytes']) == (100, 100)
+    assert snapshot['histogramMs'][-1] == ['+Inf', 0]
+
+
+def test_records_routes(client):
+    # recorded when the response is closed, i.e. once the server has sent it
+    client.get('/').close()
+    client.get('/nowhere').close()
+    snapshot = instrumentation.snapshot()
+    assert snapshot['/']['count'] == 1 and snapshot['/']['maxBytes'] > 0
+    assert snapshot['<unmatched>']['count'] == 1
+
+
+@pytest.mark.parametrize('config', [{'INSTRUMENTATION_ENABLED': False}, {'INSTRUMENTATION_SAMPLE_RATE': 0.0}])
+def test_kill_switch_and_sampling(app, client, config):
+    app.config.update(config)
+    for _ in range(5):
+        client.get('/').close()
+    assert instrumentation.snapshot() == {}
+
+
+def test_streamed_response_is_recorded_once_sent(client, db):
+    db.messages.insert_one({'chatId': 'a:b', 'sender': 'a', 'recipient': 'b', 'message': 'hi',
+                            'timestamp': datetime(2025, 1, 1)})
+    route = '/auth/chat/messages/<chat_id>'
+    response = client.get('/auth/chat/messages/a:b?stream=1', buffered=False)
+    assert route not in instrumentation.snapshot()
+
+    assert b'"hi"' in b''.join(response.response)
+    response.close()
+    recorded = instrumentation.snapshot()[route]
+    assert recorded['count'] == 1
+    assert recorded['avgBytes'] is None
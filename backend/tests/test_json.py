@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from bson import ObjectId
+from flask import Flask
+from extensions import json_provider
+from extensions.compression import compression
+from extensions.json_provider import FastJSONProvider
+
+OID = ObjectId('6ad4dd7dcd987aa95eb8ce5f')
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def provider(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    elif json_provider.orjson is None:
+        pytest.skip("orjson is not installed")
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    yield app.json  # the provider only holds a weakref to app
+
+
+def test_encodes_mongo_types(provider):
+    document = {'_id': OID, 'naive': datetime(2025, 1, 1, 12, 30), 'day': date(2025, 1, 2),
+                'aware': datetime(2025, 1, 1, 14, 30, tzinfo=timezone(timedelta(hours=2))), 'text': 'é'}
+    expected = {'_id': '6ad4dd7dcd987aa95eb8ce5f', 'naive': '2025-01-01T12:30:00+00:00', 'day': '2025-01-02',
+                'aware': '2025-01-01T14:30:00+02:00', 'text': 'é'}
+    assert json.loads(provider.dumps_bytes(document)) == expected
+    assert json.loads(provider.dumps(document)) == expected
+    assert 'é'.encode() in provider.dumps_bytes(document)
+
+
+def test_array_response_streams_chunks(provider):
+    documents = ({'i': i, '_id': OID} for i in range(25))
+    response = provider.array_response(documents, chunk_size=10)
+    assert response.is_streamed
+    body = list(response.response)
+    assert len(body) == 4  # "[" + chunk, two more chunks, "]"
+    assert json.loads(b''.join(body)) == [{'i': i, '_id': str(OID)} for i in range(25)]
+    assert b''.join(provider.array_response([]).response) == b'[]\n'
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.json['message']
+
+
+def test_gzip_when_accepted(client, db):
+    db.messages.insert_many([{'chatId': 'a:b', 'sender': 'a', 'recipient': 'b', 'message': 'x' * 20,
+                              'timestamp': datetime(2025, 1, 1, 12, 0, i)} for i in range(50)])
+    plain = client.get('/auth/chat/messages/a:b?limit=50')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/auth/chat/messages/a:b?limit=50', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.get_data())) == plain.json
+
+
+def test_streamed_ndjson_is_compressed(client, db):
+    db.messages.insert_many([{'chatId': 'a:b', 'sender': 'a', 'recipient': 'b', 'message': f'm{i}',
+                              'timestamp': datetime(2025, 1, 1, 12, 0, i)} for i in range(3)])
+    response = client.get('/auth/chat/messages/a:b?stream=1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(line)['message'] for line in lines] == ['m0', 'm1', 'm2']
+
+
+def test_stream_compression_is_chunk_by_chunk(app):
+    consumed = []
+
+    def chunks():
+        for _ in range(3):
+            consumed.append(1)
+            yield os.urandom(65536)
+
+    data = []
+    with app.test_request_context():
+        stream = compression._compress_stream(chunks(), 'gzip')
+        data.append(next(stream))
+        assert len(consumed) == 1
+        data.extend(stream)
+    assert len(gzip.decompress(b''.join(data))) == 3 * 65536
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from models.message import encode_cursor, decode_cursor
+
+START = datetime(2025, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def chat(db):
+    """
+    120 messages in chat "a:b", every two sharing a timestamp, plus one in
+    another chat.
+    """
+    messages = [{'_id': ObjectId(), 'chatId': 'a:b', 'sender': 'a', 'recipient': 'b', 'message': f"m{i}",
+                 'timestamp': START + timedelta(seconds=i // 2)} for i in range(120)]
+    db.messages.insert_many(messages)
+    db.messages.insert_one({'chatId': 'c:d', 'sender': 'c', 'recipient': 'd', 'message': 'other',
+                            'timestamp': START})
+    return [m['message'] for m in messages]
+
+
+def texts(messages):
+    return [m['message'] for m in messages]
+
+
+def test_cursor_roundtrip():
+    message = {'_id': ObjectId(), 'timestamp': START}
+    ts, oid = decode_cursor(encode_cursor(message))
+    assert ts.replace(tzinfo=None) == START
+    assert oid == message['_id']
+
+
+@pytest.mark.parametrize('cursor', ['nope', '12_zz', '_', 'x_' + str(ObjectId())])
+def test_invalid_cursor(client, chat, cursor):
+    response = client.get(f'/auth/chat/messages/a:b?before={cursor}')
+    assert response.status_code == 400
+    assert 'Invalid cursor' in response.json['error']
+
+
+def test_without_params_returns_the_whole_history(client, chat):
+    response = client.get('/auth/chat/messages/a:b', buffered=False)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert texts(response.json) == chat
+    assert all('cursor' in m and '_id' not in m for m in response.json)
+
+
+def test_pages_backwards_and_forwards_across_tied_timestamps(client, chat):
+    newest = client.get('/auth/chat/messages/a:b?limit=25').json
+    assert texts(newest) == chat[-25:]
+
+    older = []
+    before = newest[0]['cursor']
+    while True:
+        page = client.get(f'/auth/chat/messages/a:b?limit=25&before={before}').json
+        if not page:
+            break
+        older = page + older
+        before = page[0]['cursor']
+    assert texts(older + newest) == chat
+
+    after = client.get(f"/auth/chat/messages/a:b?limit=7&after={older[10]['cursor']}").json
+    assert texts(after) == chat[11:18]
+
+
+def test_limit_is_capped_and_validated(client, chat):
+    assert len(client.get('/auth/chat/messages/a:b?limit=5').json) == 5
+    assert client.get('/auth/chat/messages/a:b?limit=-1').status_code == 400
+    assert client.get('/auth/chat/messages/a:b?before=x&after=y').status_code == 400
+
+
+def test_stream_ndjson(client, chat):
+    first = client.get('/auth/chat/messages/a:b?limit=3').json
+    response = client.get(f"/auth/chat/messages/a:b?stream=1&after={first[0]['cursor']}")
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert texts(lines) == chat[chat.index(first[0]['message']) + 1:]
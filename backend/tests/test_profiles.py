@@ -0,0 +1,37 @@
+from extensions.cache import TTLCache, profile_cache
+
+
+def test_default_ttl_bounds_staleness(app):
+    assert app.config['PROFILE_CACHE_TTL'] <= 60
+    assert profile_cache.ttl == app.config['PROFILE_CACHE_TTL']
+
+
+def test_avatar_change_is_served_after_invalidation(app, client, db):
+    app.config['CACHE_INVALIDATE_TOKEN'] = 's3cret'
+    db.users.insert_one({'email': 'a@x', 'nickname': 'Alice', 'avatarUrl': 'old.png'})
+    assert client.get('/auth/user?email=a@x').json['avatarUrl'] == 'old.png'
+
+    db.users.update_one({'email': 'a@x'}, {'$set': {'avatarUrl': 'new.png'}})
+    assert client.get('/auth/user?email=a@x').json['avatarUrl'] == 'old.png'
+
+    assert client.post('/auth/user/invalidate', json={'email': 'a@x'},
+                       headers={'X-Cache-Invalidate-Token': 's3cret'}).status_code == 200
+    assert client.get('/auth/user?email=a@x').json['avatarUrl'] == 'new.png'
+    assert client.post('/auth/users/batch', json={'emails': ['a@x', 'b@x']}).json == {
+        'a@x': {'avatarUrl': 'new.png', 'nickname': 'Alice'}}
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('extensions.cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(max_size=2, ttl=30)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    now[0] += 31
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+    for key in 'bcd':
+        cache.set(key, key)
+    assert cache.get_many('bcd') == {'c': 'c', 'd': 'd'}
+    assert cache.stats()['evictions'] == 1
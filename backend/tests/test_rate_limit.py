@@ -0,0 +1,117 @@
+import mongomock
+import pytest
+from flask import Flask
+from extensions.rate_limit import MemoryBucketStore, RateLimiter, RateLimited, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit('10/minute') == (10 / 60, 10)
+    assert parse_limit('5 / seconds') == (5, 5)
+
+
+def test_memory_bucket_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('extensions.rate_limit.time.monotonic', lambda: now[0])
+    store = MemoryBucketStore()
+    rate, burst = parse_limit('2/second')
+    assert store.take('k', rate, burst) == 0
+    assert store.take('k', rate, burst) == 0
+    assert store.take('k', rate, burst) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert store.take('k', rate, burst) == 0
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryBucketStore(max_keys=2)
+    for key in ('a', 'b', 'a', 'c'):
+        store.take(key, 1, 1)
+    assert list(store.buckets) == ['a', 'c']
+    assert store.stats()['evictions'] == 1
+
+
+def test_login_is_limited_per_account(client):
+    def login(email):
+        return client.post('/auth/login', json={'email': email, 'password': 'p'})
+
+    for _ in range(10):
+        assert login('A@x ').status_code == 401
+    limited = login('a@x')
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1
+    assert login('b@x').status_code == 401
+
+    stats = client.get('/metrics').json['rateLimits']
+    assert stats['routes']['auth.login:account'] == {'allowed': 11, 'limited': 1}
+    assert stats['routes']['auth.login:ip'] == {'allowed': 12, 'limited': 0}
+
+
+def test_unlisted_routes_and_disabled_limiter_are_not_limited():
+    app = Flask(__name__)
+    app.config.update(RATE_LIMIT_ENABLED=False, RATE_LIMITS={'auth.login': {'ip': '1/minute'}})
+    limiter = RateLimiter()
+    limiter.init_app(app)
+    for _ in range(3):
+        limiter.hit('auth.login', '1.2.3.4')
+
+    app.config['RATE_LIMIT_ENABLED'] = True
+    limiter.init_app(app)
+    limiter.hit('auth.users', '1.2.3.4')
+    limiter.hit('auth.users', '1.2.3.4')
+
+
+def test_mongo_store_shares_buckets():
+    db = mongomock.MongoClient().db
+    app = Flask(__name__)
+    app.config.update(RATE_LIMIT_STORAGE='mongo', RATE_LIMITS={'auth.login': {'ip': '2/minute'}})
+    limiters = [RateLimiter(), RateLimiter()]
+    for limiter in limiters:
+        limiter.init_app(app, get_db=lambda: db)
+
+    limiters[0].hit('auth.login', '1.2.3.4')
+    limiters[1].hit('auth.login', '1.2.3.4')
+    with pytest.raises(RateLimited) as e:
+        limiters[0].hit('auth.login', '1.2.3.4')
+    assert 1 <= e.value.retry_after <= 30
+    bucket = db.rate_limits.find_one({'_id': 'auth.login:ip:1.2.3.4'})
+    assert bucket['allowed'] is False and 'expiresAt' in bucket
+
+
+def test_store_failures_let_requests_through():
+    app = Flask(__name__)
+    app.config.update(RATE_LIMIT_STORAGE='mongo', RATE_LIMITS={'auth.login': {'ip': '1/minute'}})
+
+    def down():
+        raise ConnectionError("no server")
+
+    limiter = RateLimiter()
+    limiter.init_app(app, get_db=down)
+    limiter.hit('auth.login', '1.2.3.4')
+    limiter.hit('auth.login', '1.2.3.4')
+    assert limiter.stats()['storeErrors'] == 2
+
+
+@pytest.mark.parametrize('hops, forwarded, expected', [
+    (0, '1.1.1.1', '10.0.0.1'),
+    (1, '1.1.1.1', '1.1.1.1'),
+    (1, 'spoofed, 1.1.1.1', '1.1.1.1'),
+    (2, 'spoofed, 1.1.1.1, 10.0.0.2', '1.1.1.1'),
+    (2, '1.1.1.1', '10.0.0.1'),
+    (1, None, '10.0.0.1'),
+])
+def test_client_ip_trusts_only_the_configured_hops(hops, forwarded, expected):
+    app = Flask(__name__)
+    app.config['RATE_LIMIT_PROXY_HOPS'] = hops
+    limiter = RateLimiter()
+    limiter.init_app(app)
+    headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+    with app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}) as ctx:
+        assert limiter.client_ip(ctx.request) == expected
+
+
+def test_rotating_the_first_forwarded_hop_does_not_escape_the_limit(client, monkeypatch):
+    from extensions.rate_limit import rate_limiter
+    monkeypatch.setattr(rate_limiter, 'proxy_hops', 1)
+    statuses = [client.get('/auth/users?q=a', headers={'X-Forwarded-For': f'10.1.{i // 256}.{i % 256}, 1.1.1.1'})
+                .status_code for i in range(121)]
+    assert statuses[:120] == [200] * 120
+    assert statuses[120] == 429
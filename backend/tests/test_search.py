@@ -0,0 +1,72 @@
+import threading
+from models.user import NgramIndex, normalized_fields, normalize_users, search_users
+
+
+def add_user(db, email, nickname, legacy=False):
+    user = {'email': email, 'nickname': nickname}
+    if not legacy:
+        user.update(normalized_fields(email, nickname))
+    db.users.insert_one(user)
+
+
+def emails(results):
+    return [u['email'] for u in results]
+
+
+def test_prefix_search_ranks_best_matches_first(db):
+    add_user(db, 'zed@example.com', 'Alicen')
+    add_user(db, 'alice@example.com', 'Al')
+    add_user(db, 'bob@example.com', 'Alice')
+    assert emails(search_users(db, 'ALICE', 10)) == ['bob@example.com', 'zed@example.com', 'alice@example.com']
+    assert search_users(db, '  ', 10) == []
+    assert search_users(db, 'a.*', 10) == []
+
+
+def test_finds_users_without_normalized_fields(db):
+    add_user(db, 'Old@Example.com', 'OldTimer', legacy=True)
+    add_user(db, 'new@example.com', 'Oldish')
+    assert emails(search_users(db, 'old', 10)) == ['new@example.com', 'Old@Example.com']
+
+    assert normalize_users(db) == 1
+    assert emails(search_users(db, 'old', 10)) == ['new@example.com', 'Old@Example.com']
+
+
+def test_ngram_index_adds_substring_matches(db):
+    add_user(db, 'carol@example.com', 'Caroline')
+    add_user(db, 'dave@example.com', 'Dave')
+    index = NgramIndex(refresh_interval=3600)
+    assert emails(search_users(db, 'roli', 10, ngram_index=index)) == ['carol@example.com']
+
+    # users inserted after the last refresh appear once it is due again
+    add_user(db, 'erin@example.com', 'Marolin')
+    assert emails(search_users(db, 'roli', 10, ngram_index=index)) == ['carol@example.com']
+    index.refresh(db, force=True)
+    assert emails(search_users(db, 'roli', 10, ngram_index=index)) == ['erin@example.com', 'carol@example.com']
+
+
+def test_concurrent_refreshes_scan_once(db):
+    add_user(db, 'carol@example.com', 'Caroline')
+    index = NgramIndex()
+    scans = []
+    started = threading.Event()
+    release = threading.Event()
+    original = index._refresh_cursor
+
+    def slow_cursor(db):
+        scans.append(1)
+        started.set()
+        release.wait(5)
+        return original(db)
+
+    index._refresh_cursor = slow_cursor
+    first = threading.Thread(target=index.refresh, args=(db,))
+    first.start()
+    started.wait(5)
+    index.refresh(db, force=True)  # returns at once: a refresh is running
+    release.set()
+    first.join()
+
+    assert len(scans) == 1
+    assert emails(index.search('aro', 10)) == ['carol@example.com']
+    index.refresh(db, force=True)
+    assert len(scans) == 2
@@ -0,0 +1,176 @@
+"""
+The shared auth_common paths through both serving modes: the Flask (WSGI)
+blueprint and the Quart (ASGI) one must answer alike.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+import jwt
+import mongomock
+import pytest
+from flask_jwt_extended import decode_token
+
+pytest.importorskip('mongomock_motor')
+
+
+@pytest.fixture
+def shared_db(app):
+    """One mongomock database behind both the sync and the async client."""
+    from mongomock_motor import AsyncMongoMockClient
+    from extensions.async_database import async_mongo
+    from extensions.database import mongo
+
+    client = mongomock.MongoClient()
+    mongo.client_factory = lambda uri, **options: client
+    async_mongo.client_factory = lambda uri, **options: AsyncMongoMockClient(mock_mongo_client=client)
+    yield mongo.get_db()
+    async_mongo.client = None
+    async_mongo.client_factory = None
+
+
+@pytest.fixture
+def asgi_app(shared_db):
+    from asgi import create_asgi_app
+    return create_asgi_app('testing')
+
+
+@pytest.fixture(params=['wsgi', 'asgi'])
+def call(request, app, asgi_app):
+    """
+    call(method, path, json=None, headers=None) -> (status, headers, body bytes)
+    through the app of the parametrized mode.
+    """
+    if request.param == 'wsgi':
+        client = app.test_client()
+
+        def call(method, path, **kwargs):
+            response = client.open(path, method=method, **kwargs)
+            return response.status_code, response.headers, response.get_data()
+    else:
+        def call(method, path, **kwargs):
+            async def send():
+                response = await asgi_app.test_client().open(path, method=method, **kwargs)
+                return response.status_code, response.headers, await response.get_data()
+            return asyncio.run(send())
+    call.mode = request.param
+    return call
+
+
+def call_json(call, method, path, **kwargs):
+    status, headers, body = call(method, path, **kwargs)
+    return status, headers, json.loads(body)
+
+
+def register(call, email='a@x', password='p'):
+    return call_json(call, 'POST', '/auth/register', json={
+        'email': email, 'nickname': email.split('@')[0], 'password': password, 're_password': password})
+
+
+def test_validation_errors(call):
+    assert call_json(call, 'POST', '/auth/register', json={'email': 'a@x'})[::2] == (
+        400, {'error': 'All fields are required'})
+    assert call_json(call, 'POST', '/auth/register', json={
+        'email': 'a@x', 'nickname': 'a', 'password': 'p', 're_password': 'q'})[::2] == (
+        400, {'error': 'Passwords do not match'})
+    assert call_json(call, 'GET', '/auth/conversations')[::2] == (400, {'error': 'Email is required'})
+    assert call_json(call, 'POST', '/auth/users/batch', json={'emails': 'a@x'})[0] == 400
+    assert call_json(call, 'GET', '/auth/chat/messages/c?before=a&after=b')[0] == 400
+    assert call_json(call, 'GET', '/auth/chat/messages/c?before=nope')[0] == 400
+
+
+def test_register_login_and_profiles(call, app):
+    assert register(call)[0] == 201
+    assert register(call)[0] == 409
+    assert call_json(call, 'POST', '/auth/login', json={'email': 'a@x', 'password': 'x'})[0] == 401
+
+    status, _, body = call_json(call, 'POST', '/auth/login', json={'email': 'a@x', 'password': 'p'})
+    assert status == 200
+    assert body['email'] == 'a@x' and body['nickname'] == 'a'
+    # PyJWT only accepts string subjects by default; token_identity() is a dict
+    claims = jwt.decode(body['access_token'], app.config['JWT_SECRET_KEY'], algorithms=['HS256'],
+                        options={'verify_sub': False})
+    assert claims['sub'] == {'email': 'a@x', 'nickname': 'a'} and claims['type'] == 'access'
+
+    assert call_json(call, 'GET', '/auth/user?email=a@x')[::2] == (
+        200, {'avatarUrl': './avatar.png', 'nickname': 'a'})
+    assert call_json(call, 'POST', '/auth/users/batch', json={'emails': ['a@x', 'z@x']})[2] == {
+        'a@x': {'avatarUrl': './avatar.png', 'nickname': 'a'}}
+    assert [u['email'] for u in call_json(call, 'GET', '/auth/users?q=A')[2]] == ['a@x']
+
+
+def test_tokens_follow_the_jwt_settings(call, app, asgi_app):
+    for config in (app.config, asgi_app.config):
+        config.update(JWT_IDENTITY_CLAIM='identity', JWT_ACCESS_TOKEN_EXPIRES=60, JWT_ENCODE_ISSUER='chat')
+    register(call)
+    token = call_json(call, 'POST', '/auth/login', json={'email': 'a@x', 'password': 'p'})[2]['access_token']
+
+    app.config['JWT_DECODE_ISSUER'] = 'chat'
+    with app.app_context():
+        claims = decode_token(token)
+    assert claims['identity'] == {'email': 'a@x', 'nickname': 'a'} and 'sub' not in claims
+    assert claims['iss'] == 'chat'
+    assert claims['exp'] - claims['iat'] == 60
+
+    for config in (app.config, asgi_app.config):
+        config['JWT_ACCESS_TOKEN_EXPIRES'] = False
+    token = call_json(call, 'POST', '/auth/login', json={'email': 'a@x', 'password': 'p'})[2]['access_token']
+    with app.app_context():
+        assert 'exp' not in decode_token(token)
+
+
+def test_cache_invalidation_needs_the_shared_token(call, app, asgi_app):
+    path, body = '/auth/user/invalidate', {'email': 'a@x'}
+    assert call('POST', path, json=body, headers={'X-Cache-Invalidate-Token': ''})[0] == 403
+
+    for config in (app.config, asgi_app.config):
+        config['CACHE_INVALIDATE_TOKEN'] = 's3cret'
+    assert call('POST', path, json=body)[0] == 403
+    assert call('POST', path, json=body, headers={'X-Cache-Invalidate-Token': 'wrong'})[0] == 403
+    assert call('POST', path, json=body, headers={'X-Cache-Invalidate-Token': 's3cret'})[0] == 200
+
+
+def test_rate_limited_with_retry_after(call):
+    for _ in range(10):
+        assert call('POST', '/auth/login', json={'email': 'a@x', 'password': 'p'})[0] == 401
+    status, headers, body = call_json(call, 'POST', '/auth/login', json={'email': 'a@x', 'password': 'p'})
+    assert (status, body) == (429, {'error': 'Too many requests, please try again later'})
+    assert int(headers['Retry-After']) >= 1
+
+
+def test_busy_hasher(call, monkeypatch):
+    from extensions.hashing import hasher, HasherBusy
+
+    def busy(*args):
+        raise HasherBusy("Password hashing timed out", retry_after=10)
+
+    monkeypatch.setattr(hasher, 'hash', busy)
+    monkeypatch.setattr(hasher, '_run_async', busy)
+    status, headers, _ = register(call)
+    assert status == 429 and headers['Retry-After'] == '10'
+
+
+def test_paging_inbox_and_streams(call, shared_db):
+    start = datetime(2025, 1, 1, 12, 0)
+    shared_db.messages.insert_many([{'chatId': 'a:b', 'sender': 'a', 'recipient': 'b', 'message': f'm{i}',
+                                     'timestamp': start + timedelta(seconds=i // 2)} for i in range(9)])
+    shared_db.conversations.insert_many([
+        {'user': 'a', 'participant': 'b', 'chatId': 'a:b', 'lastMessage': 'm8',
+         'timestamp': start + timedelta(seconds=4), 'unreadCount': 0},
+        {'user': 'a', 'participant': 'c', 'chatId': 'a:c', 'lastMessage': 'hi', 'timestamp': start, 'unreadCount': 2}])
+
+    status, _, everything = call_json(call, 'GET', '/auth/chat/messages/a:b')
+    assert status == 200 and [m['message'] for m in everything] == [f'm{i}' for i in range(9)]
+    assert everything[0]['timestamp'] == '2025-01-01T12:00:00+00:00'
+
+    newest = call_json(call, 'GET', '/auth/chat/messages/a:b?limit=4')[2]
+    older = call_json(call, 'GET', f"/auth/chat/messages/a:b?limit=4&before={newest[0]['cursor']}")[2]
+    assert [m['message'] for m in older + newest] == [f'm{i}' for i in range(1, 9)]
+
+    status, headers, body = call('GET', f"/auth/chat/messages/a:b?stream=1&after={older[0]['cursor']}")
+    assert headers['Content-Type'].startswith('application/x-ndjson')
+    assert [json.loads(line)['message'] for line in body.splitlines()] == [f'm{i}' for i in range(2, 9)]
+
+    inbox = call_json(call, 'GET', '/auth/conversations?email=a')[2]
+    assert [(c['participant'], c['unreadCount']) for c in inbox] == [('b', 0), ('c', 2)]
+    assert call_json(call, 'POST', '/auth/conversations/read', json={'email': 'a', 'participant': 'c'})[0] == 200
+    assert call_json(call, 'GET', '/auth/conversations?email=a&limit=1')[2][0]['participant'] == 'b'
@@ -67,6 +67,35 @@ exports.saveMessage = async (req, res) => {
     await newMessage.save();
     console.log("[INFO] Message saved:", newMessage);
 
+    // Fold the message into both participants' inbox entries (the read
+    // model Flask's /auth/conversations serves; see backend/models/conversation.py)
+    const lastMessage = newMessage.message || (newMessage.file && newMessage.file.name) || "";
+    const inboxUpdate = { chatId, lastMessage, timestamp: newMessage.timestamp };
+    try {
+      await Conversation.bulkWrite(
+        [
+          {
+            updateOne: {
+              filter: { user: sender, participant: recipient },
+              update: { $set: inboxUpdate, $setOnInsert: { unreadCount: 0 } },
+              upsert: true,
+            },
+          },
+          {
+            updateOne: {
+              filter: { user: recipient, participant: sender },
+              update: { $set: inboxUpdate, $inc: { unreadCount: 1 } },
+              upsert: true,
+            },
+          },
+        ],
+        { ordered: false }
+      );
+    } catch (inboxErr) {
+      // The message is saved; `flask inbox backfill` repairs the inbox
+      console.error("Error updating conversations:", inboxErr);
+    }
+
     res.status(201).json(newMessage);
 
     // Optionally broadcast to Socket.io if you'd like:
@@ -6,6 +6,7 @@ const ConversationSchema = new mongoose.Schema({
   chatId: { type: String, required: true }, // Links messages to the conversation
   lastMessage: { type: String, required: false }, // Content of the last message in the conversation
   timestamp: { type: Date, default: Date.now }, // Time of the last message
+  unreadCount: { type: Number, default: 0 }, // Messages from the participant the user hasn't read
 }, { timestamps: true }); // Automatically add createdAt and updatedAt
 
 // Add index for faster query performance
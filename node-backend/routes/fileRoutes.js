@@ -87,6 +87,19 @@ router.post("/upload-avatar", avatarUpload.single("avatar"), async (req, res) =>
 
     console.log(`[SUCCESS] Avatar updated for email=${userEmail}:`, avatarUrl);
 
+    // Drop Flask's cached profile so other users see the new avatar right away.
+    // Best effort: other Flask instances catch up within PROFILE_CACHE_TTL.
+    if (process.env.FLASK_BACKEND_URL && process.env.CACHE_INVALIDATE_TOKEN) {
+      fetch(`${process.env.FLASK_BACKEND_URL}/auth/user/invalidate`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "X-Cache-Invalidate-Token": process.env.CACHE_INVALIDATE_TOKEN,
+        },
+        body: JSON.stringify({ email: userEmail }),
+      }).catch((err) => console.error("[WARN] Profile cache invalidation failed:", err.message));
+    }
+
     return res.status(200).json({
       message: "Avatar uploaded successfully",
       url: avatarUrl,